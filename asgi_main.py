@@ -0,0 +1,361 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from datetime import datetime
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+
+from constants import LOAD_MODELS_IN_BACKGROUND, PRELOAD_SHARED_MODELS, ASGI_DB_THREADS, ASGI_MODEL_THREADS
+from dbClient.AsyncMongoDbClient import AsyncMongoDbClient
+from models.inferenceBatcher import InferenceTimeoutError
+from services.LearnWordsService import LearnWordsService
+from services.PredictWordsService import PredictWordsService
+from utils.Metrics import metrics
+
+learnWordsService = LearnWordsService()
+predictWordsService = PredictWordsService()
+asyncMongoClient = AsyncMongoDbClient(learnWordsService.mongoClient, ASGI_DB_THREADS)
+model_executor = ThreadPoolExecutor(ASGI_MODEL_THREADS, thread_name_prefix='model')
+
+
+def start_loading():
+    learnWordsService.start_loading()
+    predictWordsService.start_loading()
+
+
+if PRELOAD_SHARED_MODELS:
+    predictWordsService.preload_shared()
+elif LOAD_MODELS_IN_BACKGROUND:
+    start_loading()
+
+app = cors(Quart(__name__), allow_origin='*')
+query_monitor = learnWordsService.mongoClient.query_monitor
+
+
+@app.before_request
+async def begin_request_monitoring():
+    g.request_started_at = time.perf_counter()
+    query_monitor.begin_request(request.url_rule.rule if request.url_rule else None)
+
+
+@app.after_request
+async def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('request_duration_seconds', (('route', route), ('method', request.method)),
+                    time.perf_counter() - g.request_started_at)
+    metrics.increment('requests_total', (('route', route), ('method', request.method),
+                                         ('status', response.status_code)))
+
+    if response.status_code >= 500:
+        metrics.increment('request_errors_total', (('route', route), ('method', request.method)))
+
+    return response
+
+
+@app.teardown_request
+async def end_request_monitoring(exception):
+    query_monitor.end_request()
+
+
+async def run_model(func, *args):
+    loop = asyncio.get_running_loop()
+
+    context = contextvars.copy_context()
+
+    return await loop.run_in_executor(model_executor, partial(context.run, func, *args))
+
+
+def embed_learning_words(words):
+    predictWordsService.ensure_loaded()
+
+    return predictWordsService.embed_words(words)
+
+
+async def get_learning_vocabulary_embedding(user_id):
+    version = await asyncMongoClient.get_user_vocabulary_version(user_id)
+    vocabulary_embedding = asyncMongoClient.user_vocabulary_cache.get(user_id, version)
+
+    if vocabulary_embedding is None:
+        words = await asyncMongoClient.run(predictWordsService.get_user_learning_vocabulary, user_id)
+        vocabulary_embedding = await run_model(embed_learning_words, words)
+        asyncMongoClient.user_vocabulary_cache.put(user_id, vocabulary_embedding, version)
+
+    return vocabulary_embedding
+
+
+async def stream_chunks(chunks):
+    while True:
+        chunk = await asyncMongoClient.run(next, chunks, None)
+
+        if chunk is None:
+            return
+
+        yield chunk
+
+
+@app.route('/predict', methods=['POST'])
+async def predict():
+    data = await request.get_json()
+    text = data['text']
+    num_words = data.get('num_words', 3)
+    try:
+        predictions = await run_model(predictWordsService.predict_next_words, text, num_words)
+        return jsonify({'predictions': predictions})
+    except InferenceTimeoutError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+
+@app.route('/predict-synonyms', methods=['POST'])
+async def predict_synonyms():
+    data = await request.get_json()
+    user_id = data['user_id']
+    text = data['text']
+    num_words = data.get('num_words', 3)
+    try:
+        if predictWordsService.synonymTable is not None:
+            learning_words, top_words = await asyncio.gather(
+                asyncMongoClient.run(predictWordsService.get_learning_words, user_id),
+                run_model(predictWordsService.predict_next_words, text, num_words))
+            predictions = predictWordsService.find_synonyms_in_table(learning_words, top_words)
+
+            if predictions is not None:
+                return jsonify({'predictions': predictions})
+
+            vocabulary_embedding = await get_learning_vocabulary_embedding(user_id)
+        else:
+            vocabulary_embedding, top_words = await asyncio.gather(
+                get_learning_vocabulary_embedding(user_id),
+                run_model(predictWordsService.predict_next_words, text, num_words))
+
+        predictions = await run_model(predictWordsService.find_synonyms_in_vocabulary, vocabulary_embedding,
+                                      top_words)
+        return jsonify({'predictions': predictions})
+    except InferenceTimeoutError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+
+@app.route('/healthz', methods=['GET'])
+async def healthz():
+    return jsonify({
+        'status': 'ok',
+        'components': {
+            'learn_words_service': learnWordsService.get_status(),
+            'predict_words_service': predictWordsService.get_status()
+        }
+    }), 200
+
+
+@app.route('/readyz', methods=['GET'])
+async def readyz():
+    learnWordsService.retry_loading()
+    predictWordsService.retry_loading()
+    is_ready = learnWordsService.is_ready() and predictWordsService.is_ready()
+    response = {
+        'ready': is_ready,
+        'components': {
+            'learn_words_service': learnWordsService.get_status(),
+            'predict_words_service': predictWordsService.get_status()
+        }
+    }
+
+    return jsonify(response), 200 if is_ready else 503
+
+
+@app.route('/stats', methods=['GET'])
+async def get_stats():
+    return jsonify({
+        'inference_batcher': predictWordsService.get_inference_stats(),
+        'prediction_cache': predictWordsService.get_prediction_cache_stats(),
+        'vocabulary_cache': predictWordsService.get_vocabulary_cache_stats(),
+        'seen_words_cache': learnWordsService.get_seen_words_cache_stats(),
+        'main_vocabulary': learnWordsService.get_main_vocabulary_status(),
+        'db_indexes': learnWordsService.get_index_status(),
+        'queries': query_monitor.get_stats()
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/set_user_level', methods=['POST'])
+async def set_level():
+    request_data = await request.get_json()
+    user_id = request_data.get('user_id')
+    level = request_data.get('level')
+
+    await asyncMongoClient.run(learnWordsService.set_user_level, user_id, level)
+
+    return jsonify({'message': 'User level set successfully'}), 200
+
+
+@app.route('/get_random_word', methods=['GET'])
+async def get_new_word_to_learn():
+    user_id = request.args.get('user_id')
+
+    word_doc = await asyncMongoClient.run(learnWordsService.sample_unseen_word, user_id)
+
+    if word_doc:
+        return jsonify({"word": word_doc['Word'], "definition": word_doc.get('Definitions'),
+                        "level": word_doc.get('level')}), 200
+    else:
+        return jsonify({"error": f"There are no words to learn"}), 404
+
+
+@app.route('/learn_word', methods=['POST'])
+async def learn_word():
+    request_data = await request.get_json()
+    user_id = request_data.get('user_id')
+    word = request_data.get('word')
+
+    time_seen = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    new_row = {'word': word, 'time_seen': time_seen, 'history_seen': 1, 'history_correct': 0,
+               "is_word_learnt": False}
+
+    is_word_added = await asyncMongoClient.run(learnWordsService.save_word_to_user_vocabulary, new_row, user_id)
+
+    if is_word_added:
+        definition = learnWordsService.get_word_definition(new_row['word'])
+        return jsonify({"word": new_row['word'], "definition": definition}), 200
+    else:
+        return jsonify({"error": f"Word '{new_row['word']}' already exists in user vocabulary."}), 404
+
+
+@app.route('/get_words_to_relearn', methods=['GET'])
+async def get_words_to_relearn():
+    user_id = request.args.get('user_id')
+
+    if not learnWordsService.is_ready():
+        await asyncMongoClient.run(learnWordsService.ensure_loaded)
+
+    vocabulary_version, relearn_queue = await asyncio.gather(
+        asyncMongoClient.get_user_vocabulary_version(user_id), asyncMongoClient.get_relearn_queue(user_id))
+
+    if not learnWordsService.is_relearn_queue_fresh(relearn_queue, vocabulary_version):
+        relearn_queue = await run_model(learnWordsService.rebuild_relearn_queue, user_id, vocabulary_version)
+
+    if relearn_queue['candidates_count'] < 1:
+        return jsonify({'massage': 'User has no words to relearn'}), 200
+
+    if not relearn_queue['words']:
+        return jsonify({'massage': 'User has no words to relearn. All words have high probability'}), 200
+
+    result_array = [{'word': item['word'], 'definition': learnWordsService.get_word_definition(item['word'])}
+                    for item in relearn_queue['words']]
+
+    response = {'words': result_array}
+
+    return jsonify(response), 200
+
+
+@app.route('/relearn_result', methods=['POST'])
+async def handle_word_relearn_result():
+    request_data = await request.get_json()
+    user_id = request_data.get('user_id')
+    word = request_data.get('word')
+    repetition_result = request_data.get('result')
+
+    successful_result = await asyncMongoClient.run(learnWordsService.handle_repetition_result, user_id, word,
+                                                   repetition_result)
+
+    if successful_result:
+        return jsonify({'message': 'Result of repetition was saved successfully'}), 200
+    else:
+        return jsonify({'error': 'Error occurred while saving the repetition result'}), 404
+
+
+@app.route('/relearn_session', methods=['POST'])
+async def handle_relearn_session():
+    request_data = await request.get_json()
+    user_id = request_data.get('user_id')
+    events = request_data.get('events')
+
+    try:
+        results = await asyncMongoClient.run(learnWordsService.apply_relearn_session, user_id, events)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'results': results}), 200
+
+
+@app.route('/set_word_as_known', methods=['POST'])
+async def set_word_as_known():
+    request_data = await request.get_json()
+    user_id = request_data.get('user_id')
+    word = request_data.get('word')
+
+    new_row = {'word': word, "is_word_learnt": True}
+
+    is_word_added = await asyncMongoClient.run(learnWordsService.save_word_to_user_vocabulary, new_row, user_id)
+
+    if is_word_added:
+        return jsonify({'message': 'Word was saved as known'}), 200
+    else:
+        return jsonify({"error": f"Word '{new_row['word']}' already exists in user vocabulary."}), 404
+
+
+@app.route('/get_user_vocabulary', methods=['GET', 'POST'])
+async def get_user_vocabulary():
+    data = request.args if request.method == 'GET' else await request.get_json()
+    user_id = data['user_id']
+
+    try:
+        query = learnWordsService.parse_vocabulary_query(data)
+        level, etag = await asyncMongoClient.run(learnWordsService.get_user_vocabulary_etag, user_id, query)
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response('', status=304)
+        elif query['limit']:
+            words, next_cursor = await asyncMongoClient.run(learnWordsService.get_user_vocabulary_page, user_id,
+                                                            level, query)
+            response = jsonify({'words': words, 'next_cursor': next_cursor})
+        else:
+            response = Response(stream_chunks(learnWordsService.stream_user_vocabulary(user_id, level, query)),
+                                mimetype='application/json')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+    response.set_etag(etag, weak=True)
+
+    return response
+
+
+@app.route('/increment_history_seen', methods=['POST'])
+async def increment_history_seen():
+    data = await request.get_json()
+    user_id = data['user_id']
+    word = data['word']
+
+    try:
+        result = await asyncMongoClient.run(learnWordsService.increment_word_history_seen, user_id, word)
+
+        if result == 0:
+            return jsonify({"error": "No matching word found"}), 404
+
+        return jsonify({"message": "history_seen incremented successfully"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/update_word_status', methods=['POST'])
+async def update_word_status():
+    data = await request.get_json()
+    user_id = data['user_id']
+    word = data['word']
+
+    update_result = await asyncMongoClient.run(learnWordsService.toggle_word_status, user_id, word)
+
+    if update_result:
+        return jsonify({'message': f"Word '{word}' status updated successfully"})
+    else:
+        return jsonify({'error': 'Word not found in user vocabulary'})
@@ -0,0 +1,135 @@
+import argparse
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import monitoring
+
+from dbClient.dbClientFactory import STORAGE_BACKENDS, create_db_client
+
+DATA_COMMANDS = {'find', 'aggregate', 'insert', 'update', 'delete', 'findAndModify', 'getMore'}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in DATA_COMMANDS:
+            with self.lock:
+                self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def measure(self, operation):
+        count_before = self.count
+        operation()
+
+        return self.count - count_before
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Count round trips of the learn, relearn and status write paths and check that concurrent '
+                    'duplicate requests cannot add a word twice. Needs a MongoDB server at MONGODB_URI.')
+    parser.add_argument('--db-name', default='word_app_atomic_check',
+                        help='Scratch database, dropped when the check finishes')
+    parser.add_argument('--backends', default=','.join(STORAGE_BACKENDS))
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=20)
+
+    return parser.parse_args()
+
+
+def seed(mongo_client):
+    mongo_client.main_vocabulary_collection.delete_many({})
+    mongo_client.main_vocabulary_collection.insert_many([
+        {'Word': 'cat', 'level': 'A1'}, {'Word': 'run', 'level': 'A2'}, {'Word': 'idea', 'level': 'B1'}])
+    mongo_client.main_vocabulary_store.refresh()
+    mongo_client.create_indexes()
+
+
+def legacy_learn_word(mongo_client, row, user_id):
+    if not mongo_client.check_if_word_exists_in_user_vocabulary(row['word'], user_id):
+        mongo_client.add_word_to_user_vocabulary(row, user_id)
+
+
+def legacy_repetition_result(mongo_client, user_id, word):
+    user_word = next(entry for entry in mongo_client.get_user_learning_vocabulary(user_id) if entry['word'] == word)
+    mongo_client.update_user_vocabulary_word(user_id, word, True, user_word.get('history_correct', 0) > 100)
+
+
+def legacy_toggle_word_status(mongo_client, user_id, word):
+    user_word = next(entry for entry in mongo_client.get_user_vocabulary(user_id) if entry['word'] == word)
+    mongo_client.update_word_status(user_id, word, not user_word['is_word_learnt'])
+
+
+def count_round_trips(counter, mongo_client):
+    row = {'word': 'idea', 'time_seen': '2024-01-01 00:00:00', 'history_seen': 1, 'history_correct': 0,
+           'is_word_learnt': False}
+    mongo_client.set_user_level('legacy', 'A2')
+    mongo_client.set_user_level('atomic', 'A2')
+
+    return [
+        ('learn_word', counter.measure(lambda: legacy_learn_word(mongo_client, row, 'legacy')),
+         counter.measure(lambda: mongo_client.add_word_if_absent(row, 'atomic'))),
+        ('relearn_result', counter.measure(lambda: legacy_repetition_result(mongo_client, 'legacy', 'idea')),
+         counter.measure(lambda: mongo_client.update_repetition_result('atomic', 'idea', True))),
+        ('update_word_status', counter.measure(lambda: legacy_toggle_word_status(mongo_client, 'legacy', 'idea')),
+         counter.measure(lambda: mongo_client.toggle_word_status('atomic', 'idea')))
+    ]
+
+
+def count_duplicates(mongo_client, label, add_word, threads, rounds):
+    duplicates = 0
+
+    with ThreadPoolExecutor(threads) as executor:
+        for round_index in range(rounds):
+            user_id = f'concurrent-{label}-{round_index}'
+            mongo_client.set_user_level(user_id, 'A1')
+            row = {'word': 'idea', 'is_word_learnt': False}
+            list(executor.map(lambda _: add_word(row, user_id), range(threads)))
+            entries = [entry for entry in mongo_client.get_user_vocabulary(user_id) if entry['word'] == 'idea']
+            duplicates += len(entries) - 1
+
+    return duplicates
+
+
+def main():
+    args = parse_args()
+    counter = CommandCounter()
+    monitoring.register(counter)
+    failed = False
+
+    for backend in args.backends.split(','):
+        mongo_client = create_db_client(backend, args.db_name)
+
+        try:
+            seed(mongo_client)
+            print(backend)
+
+            for name, legacy_count, atomic_count in count_round_trips(counter, mongo_client):
+                print(f'  {name:<20} round trips: read-then-write {legacy_count}, atomic {atomic_count}')
+
+            legacy_duplicates = count_duplicates(mongo_client, 'legacy', lambda row, user_id: legacy_learn_word(
+                mongo_client, row, user_id), args.threads, args.rounds)
+            atomic_duplicates = count_duplicates(mongo_client, 'atomic', mongo_client.add_word_if_absent,
+                                                 args.threads, args.rounds)
+            print(f'  duplicate words after {args.rounds} rounds of {args.threads} concurrent /learn_word: '
+                  f'read-then-write {legacy_duplicates}, atomic {atomic_duplicates}')
+            failed = failed or atomic_duplicates > 0
+        finally:
+            mongo_client.client.drop_database(args.db_name)
+
+    if failed:
+        print('FAILED: concurrent requests produced duplicate words')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import pickle
+import random
+import sys
+import time
+
+import numpy as np
+
+from constants import MAX_SEQUENCE_LENGTH, TOKENIZER_PATH, COMPACT_TOKENIZER_PATH
+from models.compactTokenizer import load_compact_tokenizer
+from scripts.export_compact_tokenizer import check_parity, random_text, random_texts
+from services.PredictWordsService import pad_sequence
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check that the compact tokenizer matches the pickled Keras tokenizer and compare their load '
+                    'time and per-call latency. Unpickling needs the keras package.')
+    parser.add_argument('--tokenizer-path', default=TOKENIZER_PATH)
+    parser.add_argument('--compact-path', default=COMPACT_TOKENIZER_PATH)
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--lengths', default='5,50,500,5000', help='Text lengths in words for the latency runs')
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+def timed(load):
+    started_at = time.perf_counter()
+    result = load()
+
+    return result, time.perf_counter() - started_at
+
+
+def load_pickle(path):
+    with open(path, 'rb') as handle:
+        return pickle.load(handle)
+
+
+def measure(function, texts, repeats):
+    timings = []
+
+    for i in range(repeats):
+        text = texts[i % len(texts)]
+        started_at = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - started_at)
+
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    maxlen = MAX_SEQUENCE_LENGTH - 1
+
+    keras_tokenizer, pickle_load_time = timed(lambda: load_pickle(args.tokenizer_path))
+    tokenizer, compact_load_time = timed(lambda: load_compact_tokenizer(args.compact_path))
+    print(f'load: pickle {pickle_load_time * 1000:.1f}ms (including keras import), '
+          f'compact {compact_load_time * 1000:.1f}ms')
+
+    words = list(keras_tokenizer.word_index)
+    texts = random_texts(keras_tokenizer, args.samples, args.seed)
+    mismatches, reverse_mismatches = check_parity(keras_tokenizer, tokenizer, texts)
+
+    for text in mismatches[:5]:
+        print(f'mismatch: {text!r}')
+    print(f'parity: {len(texts)} texts, {len(mismatches)} mismatches, {reverse_mismatches} reverse table mismatches')
+
+    for length in [int(length) for length in args.lengths.split(',')]:
+        length_texts = [random_text(rng, words, length) for _ in range(20)]
+        keras_p50, keras_p99 = measure(
+            lambda text: pad_sequence(keras_tokenizer.texts_to_sequences([text])[0], maxlen), length_texts,
+            args.repeats)
+        compact_p50, compact_p99 = measure(
+            lambda text: pad_sequence(tokenizer.tokenize_tail(text, maxlen), maxlen), length_texts, args.repeats)
+        print(f'{length:>5} words: pickle p50 {keras_p50:.1f}us p99 {keras_p99:.1f}us, '
+              f'compact p50 {compact_p50:.1f}us p99 {compact_p99:.1f}us')
+
+    if mismatches or reverse_mismatches:
+        print('FAILED: compact tokenizer output differs from the pickled tokenizer')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
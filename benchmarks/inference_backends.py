@@ -0,0 +1,87 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from constants import LANGUAGE_MODEL_PATH, NUMPY_MODEL_DIR
+from scripts.export_numpy_language_model import check_parity, random_sequences
+
+
+def read_rss_mib():
+    with open('/proc/self/status') as handle:
+        for line in handle:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+    return 0.0
+
+
+def load_backend(name, args):
+    rss_before = read_rss_mib()
+    started_at = time.perf_counter()
+
+    if name == 'numpy':
+        from models.numpyLanguageModel import NumpyLanguageModel
+
+        model = NumpyLanguageModel(args.numpy_dir)
+    else:
+        from tensorflow.keras.models import load_model
+
+        model = load_model(args.model_path)
+
+    return model, time.perf_counter() - started_at, read_rss_mib() - rss_before
+
+
+def measure_latency(model, sequences, batch_size, repeats):
+    timings = []
+
+    for i in range(repeats):
+        start = (i * batch_size) % max(1, len(sequences) - batch_size + 1)
+        batch = sequences[start:start + batch_size]
+        started_at = time.perf_counter()
+        model.predict_on_batch(batch)
+        timings.append(time.perf_counter() - started_at)
+
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare the numpy and TensorFlow next-word backends.')
+    parser.add_argument('--model-path', default=LANGUAGE_MODEL_PATH)
+    parser.add_argument('--numpy-dir', default=NUMPY_MODEL_DIR)
+    parser.add_argument('--samples', type=int, default=512)
+    parser.add_argument('--batch-sizes', default='1,8,32')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    numpy_model, numpy_load_time, numpy_rss = load_backend('numpy', args)
+    sequences = random_sequences(args.samples, numpy_model.output_shape[-1])
+    tf_model, tf_load_time, tf_rss = load_backend('tensorflow', args)
+
+    max_difference, top1_agreement = check_parity(numpy_model, tf_model, sequences)
+
+    print(f'parity: max |numpy - tensorflow| = {max_difference:.2e}, top-1 agreement = {top1_agreement:.4f}')
+    print(f'load: numpy {numpy_load_time:.2f}s +{numpy_rss:.1f} MiB RSS, '
+          f'tensorflow {tf_load_time:.2f}s (including import) +{tf_rss:.1f} MiB RSS')
+
+    for batch_size in batch_sizes:
+        numpy_p50, numpy_p99 = measure_latency(numpy_model, sequences, batch_size, args.repeats)
+        tf_p50, tf_p99 = measure_latency(tf_model, sequences, batch_size, args.repeats)
+        print(f'batch {batch_size:>3}: numpy p50 {numpy_p50:.2f}ms p99 {numpy_p99:.2f}ms, '
+              f'tensorflow p50 {tf_p50:.2f}ms p99 {tf_p99:.2f}ms')
+
+    if max_difference > args.tolerance:
+        print(f'FAILED: difference exceeds tolerance {args.tolerance}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
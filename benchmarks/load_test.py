@@ -0,0 +1,111 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROUTES = {
+    'predict': ('POST', '/predict', lambda user_id: {'text': 'i would like to', 'num_words': 3}),
+    'predict_synonyms': ('POST', '/predict-synonyms',
+                         lambda user_id: {'user_id': user_id, 'text': 'i would like to', 'num_words': 3}),
+    'get_random_word': ('GET', '/get_random_word?user_id={user_id}', None),
+    'get_words_to_relearn': ('GET', '/get_words_to_relearn?user_id={user_id}', None),
+    'get_user_vocabulary': ('POST', '/get_user_vocabulary', lambda user_id: {'user_id': user_id}),
+    'readyz': ('GET', '/readyz', None)
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Closed-loop load test of the HTTP routes. Run it once against the Flask app '
+                    '(gunicorn -c gunicorn.conf.py main:app) and once against the ASGI app '
+                    '(uvicorn asgi_main:app) with the same worker count to compare them. Without a MongoDB and the '
+                    'model artifacts, serve benchmarks.mock_server:flask_app or benchmarks.mock_server:asgi_app '
+                    'instead, they seed mongomock and stub the models (MOCK_DB_LATENCY_MS adds a delay per query).')
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--routes', default='get_words_to_relearn,get_random_word,predict_synonyms')
+    parser.add_argument('--user-ids', default='load-test-user',
+                        help='Comma separated users, requests cycle through them')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per route')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Seconds per route before measuring')
+
+    return parser.parse_args()
+
+
+def send(connection, method, path, body):
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    response.read()
+
+    return response.status
+
+
+def run_client(url, route, user_ids, deadline, measure_from, timings, errors, client_index):
+    method, path, make_body = ROUTES[route]
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    request_index = client_index
+
+    while time.perf_counter() < deadline:
+        user_id = user_ids[request_index % len(user_ids)]
+        request_index += 1
+        started_at = time.perf_counter()
+
+        try:
+            status = send(connection, method, path.format(user_id=user_id),
+                          make_body(user_id) if make_body else None)
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+            status = None
+
+        if started_at >= measure_from:
+            timings.append(time.perf_counter() - started_at)
+            errors.append(status is None or status >= 500)
+
+    connection.close()
+
+
+def load_route(args, route, user_ids):
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.duration
+    results = [([], []) for _ in range(args.concurrency)]
+    threads = [threading.Thread(target=run_client, args=(args.url, route, user_ids, deadline, measure_from,
+                                                         timings, errors, i))
+               for i, (timings, errors) in enumerate(results)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    timings = np.array([timing for client_timings, _ in results for timing in client_timings])
+    errors = sum(sum(client_errors) for _, client_errors in results)
+
+    if not len(timings):
+        return 0.0, 0.0, 0.0, errors
+
+    return (len(timings) / args.duration, np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000,
+            errors)
+
+
+def main():
+    args = parse_args()
+    user_ids = args.user_ids.split(',')
+
+    print(f'{args.url}, {args.concurrency} concurrent clients, {args.duration:.0f}s per route')
+
+    for route in args.routes.split(','):
+        requests_per_second, p50, p99, errors = load_route(args, route, user_ids)
+        print(f'  {route:<22} {requests_per_second:8.1f} req/s  p50 {p50:7.2f}ms  p99 {p99:7.2f}ms  '
+              f'{errors} errors')
+
+
+if __name__ == '__main__':
+    main()
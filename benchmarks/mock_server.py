@@ -0,0 +1,58 @@
+import os
+import random
+import time
+import types
+
+from benchmarks.service_benchmark import COLLECTION_METHODS, seed, use_mongomock
+
+MOCK_DB_LATENCY_MS = float(os.getenv('MOCK_DB_LATENCY_MS', 0))
+MOCK_USERS = int(os.getenv('MOCK_USERS', 20))
+MOCK_WORDS_PER_LEVEL = int(os.getenv('MOCK_WORDS_PER_LEVEL', 4000))
+MOCK_VOCABULARY_SIZES = os.getenv('MOCK_VOCABULARY_SIZES', '10,100,1000,5000,20000')
+
+
+def add_db_latency(latency_ms):
+    import mongomock
+
+    def delay(method):
+        def wrapper(self, *args, **kwargs):
+            time.sleep(latency_ms / 1000)
+
+            return method(self, *args, **kwargs)
+
+        return wrapper
+
+    for method_name in COLLECTION_METHODS:
+        method = getattr(mongomock.collection.Collection, method_name)
+        setattr(mongomock.collection.Collection, method_name, delay(method))
+
+
+def load_service(module_name):
+    os.environ['LOAD_MODELS_IN_BACKGROUND'] = '0'
+    os.environ.pop('METRICS_DIR', None)
+    use_mongomock()
+
+    service = __import__(module_name)
+    from benchmarks.stubs import install_stubs
+
+    args = types.SimpleNamespace(users=MOCK_USERS, words_per_level=MOCK_WORDS_PER_LEVEL,
+                                 vocabulary_sizes=MOCK_VOCABULARY_SIZES, seed=0)
+    words, _ = seed(service.learnWordsService.mongoClient, args, random.Random(0))
+    install_stubs(service.predictWordsService, words, ['tokenizer', 'language_model', 'nlp'])
+    service.learnWordsService.loader.load()
+    service.predictWordsService.loader.load()
+
+    if MOCK_DB_LATENCY_MS:
+        add_db_latency(MOCK_DB_LATENCY_MS)
+
+    return service.app
+
+
+def __getattr__(name):
+    if name == 'flask_app':
+        return load_service('main')
+
+    if name == 'asgi_app':
+        return load_service('asgi_main')
+
+    raise AttributeError(name)
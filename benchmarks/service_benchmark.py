@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DEFAULT_MIX = ('predict=4,predict_synonyms=2,get_random_word=4,learn_word=2,get_words_to_relearn=3,relearn_result=2,'
+               'relearn_session=1,set_word_as_known=1,get_user_vocabulary=1,increment_history_seen=2,update_word_status=1,'
+               'set_user_level=1,healthz=1,readyz=1,stats=1,metrics=1')
+ROUTE_RULES = {
+    'predict': '/predict', 'predict_synonyms': '/predict-synonyms', 'get_random_word': '/get_random_word',
+    'learn_word': '/learn_word', 'get_words_to_relearn': '/get_words_to_relearn', 'relearn_result': '/relearn_result',
+    'relearn_session': '/relearn_session', 'set_word_as_known': '/set_word_as_known', 'get_user_vocabulary': '/get_user_vocabulary',
+    'increment_history_seen': '/increment_history_seen', 'update_word_status': '/update_word_status',
+    'set_user_level': '/set_user_level', 'healthz': '/healthz', 'readyz': '/readyz', 'stats': '/stats',
+    'metrics': '/metrics'
+}
+SENTENCES = ['i would like to', 'she went to the', 'we are going to', 'it is a good', 'they have been']
+COLLECTION_METHODS = ('find', 'find_one', 'aggregate', 'count_documents', 'insert_one', 'insert_many', 'update_one',
+                      'update_many', 'replace_one', 'find_one_and_update', 'delete_one', 'delete_many', 'bulk_write',
+                      'create_index', 'distinct')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Seed synthetic users, drive every route in main.py and report throughput, latency '
+                    'percentiles and database round trips per endpoint.')
+    parser.add_argument('--mongodb-uri', default=None,
+                        help='Local MongoDB to seed, an in-process mongomock stand-in is used when omitted')
+    parser.add_argument('--db-name', default='word_app_service_benchmark')
+    parser.add_argument('--storage', default=None, help='Vocabulary storage backend, defaults to VOCABULARY_STORAGE')
+    parser.add_argument('--words-per-level', type=int, default=4000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--vocabulary-sizes', default='10,100,1000,5000,20000',
+                        help='Vocabulary sizes assigned to the synthetic users in turn')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Comma separated route=weight pairs')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--stubs', choices=['auto', 'all', 'none'], default='auto',
+                        help='Replace the next-word model, tokenizer and spaCy with stubs when their artifacts are '
+                             'missing (auto), always, or never')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Write the results as a baseline JSON file')
+    parser.add_argument('--compare', default=None, help='Baseline JSON file to diff the results against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Relative p95 or throughput change reported as a regression')
+
+    return parser.parse_args()
+
+
+def use_mongomock():
+    import mongomock
+    import pymongo
+
+    shared_client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: shared_client
+    local = threading.local()
+
+    def count_round_trip(method_name, method):
+        def wrapper(self, *args, **kwargs):
+            from dbClient.MongoDbClient import query_monitor
+
+            if getattr(local, 'depth', 0):
+                return method(self, *args, **kwargs)
+
+            local.depth = 1
+            event = types.SimpleNamespace(command_name=method_name, command={method_name: self.name},
+                                          connection_id='mongomock', request_id=object(), duration_micros=0)
+            query_monitor.started(event)
+            started_at = time.perf_counter()
+
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                event.duration_micros = int((time.perf_counter() - started_at) * 1e6)
+                query_monitor.succeeded(event)
+                local.depth = 0
+
+        return wrapper
+
+    for method_name in COLLECTION_METHODS:
+        method = getattr(mongomock.collection.Collection, method_name)
+        setattr(mongomock.collection.Collection, method_name, count_round_trip(method_name, method))
+
+
+def make_main_vocabulary(words_per_level, rng):
+    from constants import LEVEL_ORDER
+
+    return [{'Word': f'{level.lower()}word{i}', 'level': level, 'Definitions': f'definition of {level} word {i}',
+             'Age_Of_Acquisition': float(rng.uniform(2, 16)), 'Log_Freq_HAL': float(rng.uniform(2, 14)),
+             'Concreteness_Rating': float(rng.uniform(1, 5))}
+            for level in LEVEL_ORDER for i in range(words_per_level)]
+
+
+def make_user_vocabulary(words, size, rng):
+    now = datetime.now()
+    vocabulary = []
+
+    for word in rng.sample(words, min(size, len(words))):
+        history_seen = rng.randint(1, 20)
+        vocabulary.append({
+            'word': word,
+            'time_seen': (now - timedelta(days=rng.uniform(0, 60))).strftime("%Y-%m-%d %H:%M:%S"),
+            'history_seen': history_seen,
+            'history_correct': rng.randint(0, history_seen),
+            'is_word_learnt': rng.random() < 0.3
+        })
+
+    return vocabulary
+
+
+def seed(mongo_client, args, rng):
+    from constants import LEVEL_ORDER
+
+    for collection in (mongo_client.main_vocabulary_collection, mongo_client.users_vocabulary_collection,
+                       mongo_client.relearn_queues_collection):
+        collection.delete_many({})
+
+    if hasattr(mongo_client, 'users_vocabulary_words_collection'):
+        mongo_client.users_vocabulary_words_collection.delete_many({})
+
+    main_vocabulary = make_main_vocabulary(args.words_per_level, np.random.default_rng(args.seed))
+    mongo_client.main_vocabulary_collection.insert_many(main_vocabulary)
+    mongo_client.main_vocabulary_store.refresh()
+    mongo_client.ensure_indexes()
+
+    words = [doc['Word'] for doc in main_vocabulary]
+    sizes = [int(size) for size in args.vocabulary_sizes.split(',')]
+    users = []
+
+    for i in range(args.users):
+        user_id = f'benchmark-user-{i}'
+        mongo_client.set_user_level(user_id, rng.choice(LEVEL_ORDER[:3]))
+        vocabulary = make_user_vocabulary(words, sizes[i % len(sizes)], rng)
+        mongo_client.add_words_array_to_user_vocabulary(user_id, vocabulary)
+        users.append({'user_id': user_id, 'words': [entry['word'] for entry in vocabulary]})
+        print(f'seeded {user_id} with {len(vocabulary)} words')
+
+    return words, users
+
+
+def make_request(route, users, words, rng):
+    user = rng.choice(users)
+    user_id = user['user_id']
+    user_word = rng.choice(user['words']) if user['words'] else rng.choice(words)
+    session_started_at = datetime.now() - timedelta(minutes=rng.uniform(0, 30))
+    session_events = [{'word': rng.choice(user['words'] or words), 'result': rng.random() < 0.7,
+                       'timestamp': (session_started_at + timedelta(seconds=10 * i)).isoformat(timespec='seconds')}
+                      for i in range(rng.randint(1, 20))]
+
+    requests = {
+        'predict': ('POST', '/predict', {'text': rng.choice(SENTENCES), 'num_words': 3}),
+        'predict_synonyms': ('POST', '/predict-synonyms', {'user_id': user_id, 'text': rng.choice(SENTENCES)}),
+        'get_random_word': ('GET', f'/get_random_word?user_id={user_id}', None),
+        'learn_word': ('POST', '/learn_word', {'user_id': user_id, 'word': rng.choice(words)}),
+        'get_words_to_relearn': ('GET', f'/get_words_to_relearn?user_id={user_id}', None),
+        'relearn_result': ('POST', '/relearn_result', {'user_id': user_id, 'word': user_word,
+                                                       'result': rng.random() < 0.7}),
+        'relearn_session': ('POST', '/relearn_session', {'user_id': user_id, 'events': session_events}),
+        'set_word_as_known': ('POST', '/set_word_as_known', {'user_id': user_id, 'word': rng.choice(words)}),
+        'get_user_vocabulary': ('POST', '/get_user_vocabulary', {'user_id': user_id}),
+        'increment_history_seen': ('POST', '/increment_history_seen', {'user_id': user_id, 'word': user_word}),
+        'update_word_status': ('POST', '/update_word_status', {'user_id': user_id, 'word': user_word}),
+        'set_user_level': ('POST', '/set_user_level', {'user_id': user_id, 'level': rng.choice(['A1', 'A2', 'B1'])}),
+        'healthz': ('GET', '/healthz', None),
+        'readyz': ('GET', '/readyz', None),
+        'stats': ('GET', '/stats', None),
+        'metrics': ('GET', '/metrics', None)
+    }
+
+    return requests[route]
+
+
+def run_client(app, mix, users, words, seed_value, deadline, measure_from, results):
+    client = app.test_client()
+    rng = random.Random(seed_value)
+    routes, weights = zip(*mix)
+
+    while time.perf_counter() < deadline:
+        route = rng.choices(routes, weights)[0]
+        method, path, body = make_request(route, users, words, rng)
+        started_at = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        response.close()
+        elapsed = time.perf_counter() - started_at
+
+        if started_at >= measure_from:
+            results.append((route, elapsed, response.status_code >= 500))
+
+
+def summarize(results, duration, round_trips):
+    summary = {}
+
+    for route in sorted({route for route, _, _ in results}):
+        timings = np.array([elapsed for name, elapsed, _ in results if name == route]) * 1000
+        summary[route] = {
+            'requests': len(timings),
+            'errors': sum(is_error for name, _, is_error in results if name == route),
+            'throughput': len(timings) / duration,
+            'p50_ms': float(np.percentile(timings, 50)),
+            'p95_ms': float(np.percentile(timings, 95)),
+            'p99_ms': float(np.percentile(timings, 99)),
+            'db_round_trips': round_trips.get(route)
+        }
+
+    return summary
+
+
+def get_round_trips(before, after):
+    round_trips = {}
+
+    for route, path in ROUTE_RULES.items():
+        requests = after.get(path, {}).get('requests', 0) - before.get(path, {}).get('requests', 0)
+        commands = after.get(path, {}).get('commands', 0) - before.get(path, {}).get('commands', 0)
+
+        if requests:
+            round_trips[route] = commands / requests
+
+    return round_trips
+
+
+def format_round_trips(value):
+    return f'{value:.1f}' if value is not None else '-'
+
+
+def print_summary(summary):
+    print(f"{'route':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db trips':>10}{'errors':>8}")
+
+    for route, result in summary.items():
+        round_trips = format_round_trips(result['db_round_trips'])
+        print(f"{route:<24}{result['throughput']:>9.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+              f"{result['p99_ms']:>9.2f}{round_trips:>10}{result['errors']:>8}")
+
+
+def compare(summary, baseline, tolerance):
+    regressions = []
+    print(f"{'route':<24}{'req/s':>16}{'p95 ms':>18}{'db trips':>16}")
+
+    for route, result in summary.items():
+        previous = baseline['routes'].get(route)
+
+        if previous is None:
+            continue
+
+        throughput_change = result['throughput'] / previous['throughput'] - 1 if previous['throughput'] else 0.0
+        p95_change = result['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0.0
+        print(f"{route:<24}{previous['throughput']:>7.1f} {throughput_change:>+7.1%}"
+              f"{previous['p95_ms']:>9.2f} {p95_change:>+7.1%}"
+              f"{format_round_trips(previous['db_round_trips']):>8} -> {format_round_trips(result['db_round_trips'])}")
+
+        if throughput_change < -tolerance or p95_change > tolerance or (
+                (result['db_round_trips'] or 0) > (previous['db_round_trips'] or 0) + 0.5):
+            regressions.append(route)
+
+    return regressions
+
+
+def main():
+    args = parse_args()
+    os.environ['MONGODB_DB_NAME'] = args.db_name
+    os.environ['LOAD_MODELS_IN_BACKGROUND'] = '0'
+    os.environ.pop('METRICS_DIR', None)
+
+    if args.storage:
+        os.environ['VOCABULARY_STORAGE'] = args.storage
+
+    if args.mongodb_uri:
+        os.environ['MONGODB_URI'] = args.mongodb_uri
+    else:
+        use_mongomock()
+        print('using the in-process mongomock stand-in: it cannot run pipeline updates ($mergeObjects, '
+              '$dateFromString), so /relearn_result and /update_word_status need --mongodb-uri for real numbers')
+
+    import main as service
+    from benchmarks.stubs import get_missing_artifacts, install_stubs
+
+    rng = random.Random(args.seed)
+    mongo_client = service.learnWordsService.mongoClient
+    words, users = seed(mongo_client, args, rng)
+
+    stubbed = {'auto': get_missing_artifacts(), 'all': ['tokenizer', 'language_model', 'nlp'], 'none': []}[args.stubs]
+    install_stubs(service.predictWordsService, words, stubbed)
+    service.learnWordsService.loader.load()
+    service.predictWordsService.loader.load()
+    print(f"stubbed components: {', '.join(stubbed) or 'none'}")
+
+    mix = [(route, float(weight)) for route, weight in (pair.split('=') for pair in args.mix.split(','))]
+    uncovered_rules = {rule.rule for rule in service.app.url_map.iter_rules()
+                       if rule.endpoint != 'static'} - set(ROUTE_RULES.values())
+
+    if uncovered_rules:
+        print(f"routes without a benchmark request: {', '.join(sorted(uncovered_rules))}")
+
+    query_monitor = mongo_client.query_monitor
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.duration
+    results = []
+
+    threads = [threading.Thread(target=run_client, args=(service.app, mix, users, words, args.seed + i, deadline,
+                                                         measure_from, results))
+               for i in range(args.concurrency)]
+
+    for thread in threads:
+        thread.start()
+
+    time.sleep(max(0.0, measure_from - time.perf_counter()))
+    before = query_monitor.get_stats()['endpoints']
+
+    for thread in threads:
+        thread.join()
+
+    round_trips = get_round_trips(before, query_monitor.get_stats()['endpoints'])
+    summary = summarize(results, args.duration, round_trips)
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump({'created_at': datetime.now().isoformat(timespec='seconds'),
+                       'settings': {key: value for key, value in vars(args).items()
+                                    if key not in ('output', 'compare', 'mongodb_uri')},
+                       'stubbed': stubbed, 'routes': summary}, handle, indent=2)
+
+    if args.mongodb_uri:
+        mongo_client.client.drop_database(args.db_name)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(summary, json.load(handle), args.tolerance)
+
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
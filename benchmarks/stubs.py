@@ -0,0 +1,99 @@
+import importlib.util
+import os
+import zlib
+
+import numpy as np
+
+from constants import TOKENIZER_PATH, COMPACT_TOKENIZER_PATH, INFERENCE_BACKEND, LANGUAGE_MODEL_PATH, NUMPY_MODEL_DIR
+from models.compactTokenizer import convert_keras_tokenizer
+
+STUB_VECTOR_SIZE = 64
+
+
+class StubTokenizer:
+    def __init__(self, words):
+        self.filters = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+        self.split = ' '
+        self.lower = True
+        self.num_words = None
+        self.oov_token = '<OOV>'
+        self.word_index = {self.oov_token: 1}
+
+        for word in words:
+            self.word_index.setdefault(word.lower(), len(self.word_index) + 1)
+
+
+class StubLanguageModel:
+    def __init__(self, vocabulary_size):
+        self.output_shape = (None, vocabulary_size)
+        self.weights = np.random.default_rng(0).random(vocabulary_size, dtype=np.float32)
+
+    def predict_on_batch(self, sequences):
+        sequences = np.asarray(sequences)
+        shifts = sequences.sum(axis=1) % len(self.weights)
+        scores = np.stack([np.roll(self.weights, int(shift)) for shift in shifts])
+
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+class StubToken:
+    def __init__(self, text):
+        self.orth = zlib.crc32(text.encode())
+        self.tag_ = 'NN'
+
+
+class StubDoc:
+    def __init__(self, text):
+        self.tokens = [StubToken(token) for token in text.split()]
+        self.vector = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(
+            STUB_VECTOR_SIZE).astype(np.float32)
+        self.vector_norm = float(np.linalg.norm(self.vector))
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __getitem__(self, index):
+        return self.tokens[index]
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+
+class StubNlp:
+    def pipe(self, texts):
+        return (StubDoc(text) for text in texts)
+
+
+def get_missing_artifacts():
+    missing = []
+
+    if not os.path.exists(TOKENIZER_PATH) and not os.path.exists(COMPACT_TOKENIZER_PATH):
+        missing.append('tokenizer')
+
+    if INFERENCE_BACKEND == 'numpy':
+        if not os.path.exists(os.path.join(NUMPY_MODEL_DIR, 'manifest.json')):
+            missing.append('language_model')
+    elif not os.path.exists(LANGUAGE_MODEL_PATH) or importlib.util.find_spec('tensorflow') is None:
+        missing.append('language_model')
+
+    if importlib.util.find_spec('en_core_web_lg') is None:
+        missing.append('nlp')
+
+    return missing
+
+
+def install_stubs(predict_words_service, words, components):
+    def load_tokenizer():
+        predict_words_service.tokenizer = convert_keras_tokenizer(StubTokenizer(words))
+
+    def load_language_model():
+        predict_words_service.langModel = StubLanguageModel(len(predict_words_service.tokenizer.word_index) + 1)
+        predict_words_service.index_word, predict_words_service.valid_indices = \
+            predict_words_service.build_index_word()
+
+    def load_nlp():
+        predict_words_service.nlp = StubNlp()
+
+    stub_steps = {'tokenizer': load_tokenizer, 'language_model': load_language_model, 'nlp': load_nlp}
+    predict_words_service.loader.steps = [(name, stub_steps[name] if name in components else step)
+                                          for name, step in predict_words_service.loader.steps]
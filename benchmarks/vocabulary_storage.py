@@ -0,0 +1,97 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from dbClient.dbClientFactory import STORAGE_BACKENDS, create_db_client
+
+BENCHMARK_USER_ID = 'benchmark-user'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare user vocabulary read and update latency of the embedded and per-word storage backends.')
+    parser.add_argument('--db-name', default='word_app_benchmark',
+                        help='Scratch database, dropped when the benchmark finishes')
+    parser.add_argument('--sizes', default='100,1000,5000,20000')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--backends', default=','.join(STORAGE_BACKENDS))
+
+    return parser.parse_args()
+
+
+def make_vocabulary(size):
+    return [{'word': f'word{i}', 'time_seen': '2024-01-01 00:00:00', 'history_seen': 1, 'history_correct': 0,
+             'is_word_learnt': i % 2 == 0} for i in range(size)]
+
+
+def seed_user(mongo_client, size):
+    mongo_client.users_vocabulary_collection.delete_many({'_user_id': BENCHMARK_USER_ID})
+
+    if hasattr(mongo_client, 'users_vocabulary_words_collection'):
+        mongo_client.users_vocabulary_words_collection.delete_many({'_user_id': BENCHMARK_USER_ID})
+
+    mongo_client.users_vocabulary_collection.insert_one({'_user_id': BENCHMARK_USER_ID, 'vocabulary_version': 0})
+    mongo_client.add_words_array_to_user_vocabulary(BENCHMARK_USER_ID, make_vocabulary(size))
+
+
+def measure(operation, repeats):
+    timings = []
+
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - started_at)
+
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 95) * 1000
+
+
+def get_operations(mongo_client, size):
+    rng = random.Random(size)
+
+    def random_word():
+        return f'word{rng.randrange(size)}'
+
+    return [
+        ('get_user_vocabulary', lambda: mongo_client.get_user_vocabulary(BENCHMARK_USER_ID)),
+        ('get_user_learning_vocabulary', lambda: mongo_client.get_user_learning_vocabulary(BENCHMARK_USER_ID)),
+        ('check_if_word_exists', lambda: mongo_client.check_if_word_exists_in_user_vocabulary(
+            random_word(), BENCHMARK_USER_ID)),
+        ('update_user_vocabulary_word', lambda: mongo_client.update_user_vocabulary_word(
+            BENCHMARK_USER_ID, random_word(), True, False)),
+        ('increment_word_history_seen', lambda: mongo_client.increment_word_history_seen(
+            BENCHMARK_USER_ID, random_word())),
+        ('update_word_status', lambda: mongo_client.update_word_status(BENCHMARK_USER_ID, random_word(), False))
+    ]
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    clients = {backend: create_db_client(backend, args.db_name) for backend in args.backends.split(',')}
+
+    try:
+        for mongo_client in clients.values():
+            mongo_client.ensure_indexes()
+
+        for size in sizes:
+            results = {}
+
+            for backend, mongo_client in clients.items():
+                seed_user(mongo_client, size)
+
+                for name, operation in get_operations(mongo_client, size):
+                    results.setdefault(name, {})[backend] = measure(operation, args.repeats)
+
+            print(f'{size} words')
+
+            for name, backend_results in results.items():
+                print(f'  {name:<30}' + ', '.join(f'{backend} p50 {p50:.2f}ms p95 {p95:.2f}ms'
+                                                  for backend, (p50, p95) in backend_results.items()))
+    finally:
+        next(iter(clients.values())).client.drop_database(args.db_name)
+
+
+if __name__ == '__main__':
+    main()
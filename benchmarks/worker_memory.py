@@ -0,0 +1,130 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+
+from models.sharedWeights import load_arrays, save_arrays
+
+MEMORY_FIELDS = ['Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty']
+
+
+def read_memory(pid):
+    memory = {}
+
+    with open(f'/proc/{pid}/smaps_rollup') as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in MEMORY_FIELDS:
+                memory[parts[0].rstrip(':')] = int(parts[1]) / 1024
+
+    return memory
+
+
+def get_children(pid):
+    children = []
+
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as handle:
+            children.extend(int(child) for child in handle.read().split())
+
+    return children
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Report RSS/PSS of a gunicorn master and its workers, or with --simulate fork workers that each '
+                    'load a synthetic vector table privately, from a preloaded master, or memory-mapped.')
+    parser.add_argument('master_pid', type=int, nargs='?', help='PID of the gunicorn master process')
+    parser.add_argument('--simulate', action='store_true')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=514157, help='Vector rows, default matches en_core_web_lg')
+    parser.add_argument('--dims', type=int, default=300)
+
+    args = parser.parse_args()
+
+    if args.master_pid is None and not args.simulate:
+        parser.error('pass a gunicorn master PID or --simulate')
+
+    return args
+
+
+def load_vectors(directory, mode):
+    arrays, _ = load_arrays(directory, ['spacy_vectors'])
+
+    return arrays['spacy_vectors'] if mode == 'mmap' else np.array(arrays['spacy_vectors'])
+
+
+def simulate_worker(directory, mode, vectors, ready, stop):
+    if vectors is None:
+        vectors = load_vectors(directory, mode)
+
+    float(vectors.sum(dtype=np.float64))
+    ready.release()
+    stop.wait()
+
+
+def simulate(args):
+    context = multiprocessing.get_context('fork')
+
+    with tempfile.TemporaryDirectory() as directory:
+        rng = np.random.default_rng(0)
+        save_arrays(directory, {'spacy_vectors': rng.random((args.rows, args.dims), dtype=np.float32)})
+        print(f'synthetic vector table {args.rows}x{args.dims} float32 '
+              f'({args.rows * args.dims * 4 / 2 ** 20:.1f} MiB), {args.workers} workers')
+        print(f"{'mode':>8} {'RSS/worker MiB':>16} {'PSS/worker MiB':>16} {'private/worker MiB':>20} "
+              f"{'total PSS MiB':>15}")
+
+        for mode in ('private', 'preload', 'mmap'):
+            vectors = load_vectors(directory, 'private') if mode == 'preload' else None
+            ready = context.Semaphore(0)
+            stop = context.Event()
+            workers = [context.Process(target=simulate_worker, args=(directory, mode, vectors, ready, stop))
+                       for _ in range(args.workers)]
+
+            for worker in workers:
+                worker.start()
+            for _ in workers:
+                ready.acquire()
+
+            memory = [read_memory(worker.pid) for worker in workers]
+            stop.set()
+
+            for worker in workers:
+                worker.join()
+
+            def mean(field):
+                return sum(worker_memory[field] for worker_memory in memory) / len(memory)
+
+            print(f"{mode:>8} {mean('Rss'):>16.1f} {mean('Pss'):>16.1f} "
+                  f"{mean('Private_Clean') + mean('Private_Dirty'):>20.1f} "
+                  f"{sum(worker_memory['Pss'] for worker_memory in memory):>15.1f}")
+            del vectors
+
+
+def main():
+    args = parse_args()
+
+    if args.simulate:
+        simulate(args)
+        return
+
+    pids = [args.master_pid] + get_children(args.master_pid)
+
+    print(f"{'pid':>8} {'role':>7} " + ' '.join(f'{field + " MiB":>18}' for field in MEMORY_FIELDS))
+    totals = dict.fromkeys(MEMORY_FIELDS, 0.0)
+
+    for pid in pids:
+        memory = read_memory(pid)
+        role = 'master' if pid == args.master_pid else 'worker'
+        print(f'{pid:>8} {role:>7} ' + ' '.join(f'{memory.get(field, 0.0):>18.1f}' for field in MEMORY_FIELDS))
+
+        for field in MEMORY_FIELDS:
+            totals[field] += memory.get(field, 0.0)
+
+    print(f"{'total':>16} " + ' '.join(f'{totals[field]:>18.1f}' for field in MEMORY_FIELDS))
+
+
+if __name__ == '__main__':
+    main()
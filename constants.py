@@ -1,3 +1,5 @@
+import os
+
 MAX_SEQUENCE_LENGTH = 20
 
 SECONDS_IN_DAY = (60 * 60 * 24)
@@ -11,3 +13,85 @@ HISTORY_CORRECT_THRESHOLD = 10
 TIME_DELTA_THRESHOLD = 14
 
 LEVEL_ORDER = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+
+SYNONYM_EXCLUDE_TAGS = {'DT', 'PRP', 'IN', 'CC', 'WDT', 'NNP'}
+
+SYNONYMS_AMOUNT = 3
+
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 32))
+
+INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 5))
+
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv('INFERENCE_TIMEOUT_SECONDS', 30))
+
+USER_VOCABULARY_CACHE_SIZE = int(os.getenv('USER_VOCABULARY_CACHE_SIZE', 1024))
+
+USER_VOCABULARY_CACHE_MAX_MB = int(os.getenv('USER_VOCABULARY_CACHE_MAX_MB', 128))
+
+MAIN_VOCABULARY_TTL = int(os.getenv('MAIN_VOCABULARY_TTL', 60 * 60))
+
+RELEARN_QUEUE_TTL = int(os.getenv('RELEARN_QUEUE_TTL', 60 * 60))
+
+LOAD_MODELS_IN_BACKGROUND = os.getenv('LOAD_MODELS_IN_BACKGROUND', '1') == '1'
+
+SHARED_WEIGHTS_DIR = os.getenv('SHARED_WEIGHTS_DIR')
+
+PRELOAD_SHARED_MODELS = os.getenv('PRELOAD_SHARED_MODELS', '0') == '1'
+
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'tensorflow')
+
+TOKENIZER_PATH = os.getenv('TOKENIZER_PATH', '/home/site/wwwroot/tokenizer.pickle')
+
+COMPACT_TOKENIZER_PATH = os.getenv('COMPACT_TOKENIZER_PATH', os.path.splitext(TOKENIZER_PATH)[0] + '.npz')
+
+LANGUAGE_MODEL_PATH = os.getenv('LANGUAGE_MODEL_PATH', '/home/site/wwwroot/saved_models/next_word_model.h5')
+
+NUMPY_MODEL_DIR = os.getenv('NUMPY_MODEL_DIR', SHARED_WEIGHTS_DIR or './saved_models/shared')
+
+SYNONYM_TABLE_DIR = os.getenv('SYNONYM_TABLE_DIR', SHARED_WEIGHTS_DIR or './saved_models/shared')
+
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 20000))
+
+PREDICTION_CACHE_TOP_K = int(os.getenv('PREDICTION_CACHE_TOP_K', 10))
+
+SEEN_WORDS_CACHE_SIZE = int(os.getenv('SEEN_WORDS_CACHE_SIZE', 4096))
+
+UNSEEN_WORD_SAMPLING_ATTEMPTS = 32
+
+MONGODB_DB_NAME = os.getenv('MONGODB_DB_NAME', 'word_app_db')
+
+VOCABULARY_STORAGE = os.getenv('VOCABULARY_STORAGE', 'embedded')
+
+INDEX_RETRY_SECONDS = int(os.getenv('INDEX_RETRY_SECONDS', 300))
+
+ASGI_DB_THREADS = int(os.getenv('ASGI_DB_THREADS', 32))
+
+ASGI_MODEL_THREADS = int(os.getenv('ASGI_MODEL_THREADS', os.cpu_count() or 4))
+
+MAX_QUERIES_PER_REQUEST = int(os.getenv('MAX_QUERIES_PER_REQUEST', 10))
+
+MAX_REPEATED_QUERIES_PER_REQUEST = int(os.getenv('MAX_REPEATED_QUERIES_PER_REQUEST', 3))
+
+FLAGGED_REQUESTS_TO_KEEP = 50
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+
+PROFILE_ROUTES = [route for route in os.getenv('PROFILE_ROUTES', '').split(',') if route]
+
+PROFILES_DIR = os.getenv('PROFILES_DIR', '/tmp/word_app_profiles')
+
+PROFILES_TO_KEEP = int(os.getenv('PROFILES_TO_KEEP', 50))
+
+RELEARN_SESSION_MAX_EVENTS = int(os.getenv('RELEARN_SESSION_MAX_EVENTS', 500))
+
+RELEARN_SESSION_MAX_CLOCK_SKEW_SECONDS = int(os.getenv('RELEARN_SESSION_MAX_CLOCK_SKEW_SECONDS', 300))
+
+USER_VOCABULARY_MAX_PAGE_SIZE = int(os.getenv('USER_VOCABULARY_MAX_PAGE_SIZE', 1000))
+
+USER_VOCABULARY_EXPORT_BATCH_SIZE = int(os.getenv('USER_VOCABULARY_EXPORT_BATCH_SIZE', 1000))
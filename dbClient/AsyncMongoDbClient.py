@@ -0,0 +1,28 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class AsyncMongoDbClient:
+    def __init__(self, mongo_client, max_workers):
+        self.mongo_client = mongo_client
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='mongo-io')
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        context = contextvars.copy_context()
+
+        return await loop.run_in_executor(self.executor, partial(context.run, func, *args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.mongo_client, name)
+
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        return call
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from constants import LEVEL_ORDER
+
+logger = logging.getLogger(__name__)
+
+
+def to_float_column(docs, field):
+    column = np.full(len(docs), np.nan)
+
+    for i, doc in enumerate(docs):
+        try:
+            column[i] = float(doc.get(field))
+        except (TypeError, ValueError):
+            pass
+
+    return column
+
+
+class MainVocabularySnapshot:
+    def __init__(self, docs):
+        self.docs = docs
+        self.words = [doc.get('Word') for doc in docs]
+        self.word_index = {}
+        level_rows = {}
+
+        for i, doc in enumerate(docs):
+            self.word_index.setdefault(self.words[i], i)
+            level_rows.setdefault(doc.get('level'), []).append(i)
+
+        self.levels = {level: np.array(rows, dtype=np.int64) for level, rows in level_rows.items()}
+        self.age_of_acquisition = to_float_column(docs, 'Age_Of_Acquisition')
+        self.log_freq_hal = to_float_column(docs, 'Log_Freq_HAL')
+        self.concreteness_rating = to_float_column(docs, 'Concreteness_Rating')
+        self.loaded_at = time.time()
+        self.words_below_level = {}
+        self.sorted_words_below_level = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def get_rows(self, words):
+        return np.array([self.word_index.get(word, -1) for word in words], dtype=np.int64)
+
+    def get_words_below_level(self, level):
+        if level not in self.words_below_level:
+            lower_levels = LEVEL_ORDER[:LEVEL_ORDER.index(level)] if level in LEVEL_ORDER else []
+            self.words_below_level[level] = list(dict.fromkeys(
+                self.words[row] for lower_level in lower_levels for row in self.levels.get(lower_level, ())))
+
+        return self.words_below_level[level]
+
+    def get_sorted_words_below_level(self, level):
+        if level not in self.sorted_words_below_level:
+            words = sorted(word for word in self.get_words_below_level(level) if isinstance(word, str))
+            self.sorted_words_below_level[level] = (words, zlib.crc32('\n'.join(words).encode('utf-8')))
+
+        return self.sorted_words_below_level[level]
+
+    def is_word_below_level(self, word, level):
+        row = self.word_index.get(word)
+
+        if row is None or level not in LEVEL_ORDER or self.docs[row].get('level') not in LEVEL_ORDER:
+            return False
+
+        return LEVEL_ORDER.index(self.docs[row]['level']) < LEVEL_ORDER.index(level)
+
+
+class MainVocabularyStore:
+    def __init__(self, collection, ttl):
+        self.collection = collection
+        self.ttl = ttl
+        self.snapshot = None
+        self.next_refresh_at = 0.0
+        self.lock = threading.Lock()
+        self.refresh_thread = None
+        self.last_refresh_error = None
+        self.last_refresh_error_at = None
+
+    def load_snapshot(self):
+        return MainVocabularySnapshot(list(self.collection.find({})))
+
+    def refresh(self):
+        snapshot = self.load_snapshot()
+        self.snapshot = snapshot
+
+        return snapshot
+
+    def refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            self.last_refresh_error = str(e)
+            self.last_refresh_error_at = time.time()
+            logger.exception('Could not refresh the main vocabulary snapshot, serving the previous one')
+
+    def get_status(self):
+        snapshot = self.snapshot
+
+        return {
+            'words': len(snapshot) if snapshot is not None else 0,
+            'loaded_at': snapshot.loaded_at if snapshot is not None else None,
+            'last_refresh_error': self.last_refresh_error,
+            'last_refresh_error_at': self.last_refresh_error_at
+        }
+
+    def get_snapshot(self):
+        snapshot = self.snapshot
+
+        if snapshot is None:
+            with self.lock:
+                if self.snapshot is None:
+                    self.next_refresh_at = time.time() + self.ttl
+                    self.refresh()
+                return self.snapshot
+
+        if time.time() >= self.next_refresh_at:
+            with self.lock:
+                if time.time() >= self.next_refresh_at:
+                    self.next_refresh_at = time.time() + self.ttl
+                    self.refresh_thread = threading.Thread(target=self.refresh_in_background,
+                                                           name='main-vocabulary-refresh', daemon=True)
+                    self.refresh_thread.start()
+
+        return snapshot
+
+    def get_all(self):
+        return list(self.get_snapshot().docs)
+
+    def get_word(self, word):
+        snapshot = self.get_snapshot()
+        row = snapshot.word_index.get(word)
+
+        return snapshot.docs[row] if row is not None else None
+
+    def get_words_by_level(self, level):
+        snapshot = self.get_snapshot()
+        rows = snapshot.levels.get(level, ())
+
+        return [snapshot.docs[row] for row in rows]
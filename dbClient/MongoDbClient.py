@@ -1,36 +1,240 @@
+import heapq
+import logging
 import os
-from pymongo import MongoClient
+import re
+import time
+from bisect import bisect_left, bisect_right
+from pymongo import MongoClient, ReplaceOne, UpdateOne, ASCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from datetime import datetime
 
+from constants import (USER_VOCABULARY_CACHE_SIZE, USER_VOCABULARY_CACHE_MAX_MB, MAIN_VOCABULARY_TTL, MONGODB_DB_NAME,
+                       LEVEL_ORDER, HISTORY_CORRECT_THRESHOLD, SECONDS_IN_DAY, MAX_QUERIES_PER_REQUEST,
+                       MAX_REPEATED_QUERIES_PER_REQUEST, FLAGGED_REQUESTS_TO_KEEP, INDEX_RETRY_SECONDS)
+from dbClient.MainVocabularyStore import MainVocabularyStore
+from utils.LruCache import LruCache
+from utils.QueryMonitor import QueryMonitor
+
+user_vocabulary_cache = LruCache(USER_VOCABULARY_CACHE_SIZE, USER_VOCABULARY_CACHE_MAX_MB * 1024 * 1024,
+                                 lambda value: getattr(value, 'nbytes', 0))
+query_monitor = QueryMonitor(MAX_QUERIES_PER_REQUEST, MAX_REPEATED_QUERIES_PER_REQUEST, FLAGGED_REQUESTS_TO_KEEP)
+REPETITION_FIELDS = ('time_seen', 'history_seen', 'history_correct', 'is_word_learnt')
+logger = logging.getLogger(__name__)
+
+
+def get_repetition_fields(prefix, repetition_result, now):
+    time_seen = {'$dateFromString': {'dateString': f'{prefix}time_seen', 'format': '%Y-%m-%d %H:%M:%S',
+                                     'onNull': now, 'onError': now}}
+    history_correct = {'$ifNull': [f'{prefix}history_correct', 0]}
+    is_word_learnt = {'$and': [
+        bool(repetition_result),
+        {'$gt': [history_correct, HISTORY_CORRECT_THRESHOLD - 1]},
+        {'$gt': [{'$subtract': [now, time_seen]}, HISTORY_CORRECT_THRESHOLD * SECONDS_IN_DAY * 1000]}
+    ]}
+
+    return {
+        'time_seen': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'history_seen': {'$add': [{'$ifNull': [f'{prefix}history_seen', 0]}, 1]},
+        'history_correct': {'$add': [history_correct, int(bool(repetition_result))]},
+        'is_word_learnt': is_word_learnt
+    }
+
+
+def get_vocabulary_entry_filter(cursor, learnt, prefix):
+    word_filter = {}
+
+    if cursor is not None:
+        word_filter['$gt'] = cursor
+
+    if prefix:
+        word_filter['$regex'] = '^' + re.escape(prefix)
+
+    entry_filter = {'word': word_filter} if word_filter else {}
+
+    if learnt is not None:
+        entry_filter['is_word_learnt'] = learnt
+
+    return entry_filter
+
+
+def merge_vocabulary_entries(explicit_entries, implicit_entries):
+    previous_word = None
+
+    for entry in heapq.merge(explicit_entries, implicit_entries, key=lambda entry: entry['word']):
+        if entry['word'] != previous_word:
+            previous_word = entry['word']
+            yield entry
+
 
 class MongoDbClient:
-    def __init__(self):
+    def __init__(self, db_name=None):
         connection_string = os.getenv('MONGODB_URI')
-        db_name = 'word_app_db'
+        db_name = db_name or MONGODB_DB_NAME
         main_vocabulary_collection_name = 'main_vocabulary'
         users_vocabulary_collection_name = 'users_vocabulary'
-        self.client = MongoClient(connection_string)
+        relearn_queues_collection_name = 'relearn_queues'
+        self.client = MongoClient(connection_string, connect=False, event_listeners=[query_monitor])
         self.db = self.client[db_name]
         self.main_vocabulary_collection = self.db[main_vocabulary_collection_name]
         self.users_vocabulary_collection = self.db[users_vocabulary_collection_name]
+        self.relearn_queues_collection = self.db[relearn_queues_collection_name]
+        self.user_vocabulary_cache = user_vocabulary_cache
+        self.query_monitor = query_monitor
+        self.main_vocabulary_store = MainVocabularyStore(self.main_vocabulary_collection, MAIN_VOCABULARY_TTL)
+        self.indexes_ready = False
+        self.indexes_error = None
+        self.indexes_retry_at = 0.0
+
+    def create_indexes(self):
+        self.users_vocabulary_collection.create_index([('_user_id', ASCENDING)], unique=True)
+        self.relearn_queues_collection.create_index([('_user_id', ASCENDING)])
+
+    def ensure_indexes(self):
+        if self.indexes_ready or time.time() < self.indexes_retry_at:
+            return
+
+        try:
+            self.create_indexes()
+        except PyMongoError as e:
+            self.indexes_error = str(e)
+            self.indexes_retry_at = time.time() + INDEX_RETRY_SECONDS
+            logger.warning('Could not create the MongoDB indexes, user upserts run without the unique _user_id '
+                           'guard until scripts/merge_duplicate_users.py has run: %s', e)
+            return
+
+        self.indexes_ready = True
+        self.indexes_error = None
+
+    def get_index_status(self):
+        return {'ready': self.indexes_ready, 'error': self.indexes_error}
+
+    def get_levels_implying_word(self, word):
+        word_doc = self.get_main_word(word)
+        level = word_doc.get('level') if word_doc else None
+
+        return LEVEL_ORDER[LEVEL_ORDER.index(level) + 1:] if level in LEVEL_ORDER else []
 
     def get_main_vocabulary(self):
-        result = list(self.main_vocabulary_collection.find({}))
+        result = self.main_vocabulary_store.get_all()
 
         return result
 
+    def get_main_vocabulary_snapshot(self):
+        return self.main_vocabulary_store.get_snapshot()
+
+    def get_main_vocabulary_status(self):
+        return self.main_vocabulary_store.get_status()
+
     def get_main_word(self, word):
-        result = self.main_vocabulary_collection.find_one({"Word": word})
+        result = self.main_vocabulary_store.get_word(word)
 
         return result
 
     def get_user_vocabulary(self, user_id):
-        result = self.users_vocabulary_collection.find_one({'_user_id': user_id})
+        result = self.users_vocabulary_collection.find_one({'_user_id': user_id}, {'vocabulary': 1, 'level': 1})
+
+        if not result:
+            return []
+
+        return self.merge_implicit_known_words(result.get('vocabulary') or [], result.get('level'))
+
+    def merge_implicit_known_words(self, vocabulary, level):
+        explicit_words = {entry['word'] for entry in vocabulary}
+        implicit_words = self.get_main_vocabulary_snapshot().get_words_below_level(level)
+
+        return vocabulary + [{'word': word, 'is_word_learnt': True} for word in implicit_words
+                             if word not in explicit_words]
+
+    def get_implicit_known_words(self, level, cursor=None, prefix=None):
+        words, _ = self.get_main_vocabulary_snapshot().get_sorted_words_below_level(level)
+        start = bisect_right(words, cursor) if cursor is not None else 0
+
+        if prefix:
+            start = max(start, bisect_left(words, prefix))
+
+        for i in range(start, len(words)):
+            if prefix and not words[i].startswith(prefix):
+                break
+
+            yield words[i]
+
+    def find_user_vocabulary_entries(self, user_id, cursor, learnt, prefix, limit, batch_size):
+        pipeline = [
+            {"$match": {"_user_id": user_id}},
+            {"$unwind": "$vocabulary"},
+            {"$replaceRoot": {"newRoot": "$vocabulary"}},
+            {"$match": get_vocabulary_entry_filter(cursor, learnt, prefix)},
+            {"$sort": {"word": 1}},
+            {"$project": {"word": 1, "is_word_learnt": 1, "_id": 0}}
+        ]
+
+        if limit:
+            pipeline.insert(-1, {"$limit": limit})
+
+        return self.users_vocabulary_collection.aggregate(pipeline, batchSize=batch_size)
+
+    def iter_user_vocabulary_entries(self, user_id, level, cursor=None, learnt=None, prefix=None, limit=None,
+                                     batch_size=100):
+        if learnt is False:
+            return iter(self.find_user_vocabulary_entries(user_id, cursor, False, prefix, limit, batch_size))
+
+        explicit_entries = self.find_user_vocabulary_entries(user_id, cursor, None, prefix, None if learnt else limit,
+                                                             batch_size)
+        implicit_entries = ({'word': word, 'is_word_learnt': True}
+                            for word in self.get_implicit_known_words(level, cursor, prefix))
+        entries = merge_vocabulary_entries(explicit_entries, implicit_entries)
+
+        if learnt:
+            return (entry for entry in entries if entry.get('is_word_learnt'))
+
+        return entries
+
+    def get_user_vocabulary_state(self, user_id):
+        user_doc = self.users_vocabulary_collection.find_one({'_user_id': user_id},
+                                                             {'level': 1, 'vocabulary_version': 1, '_id': 0})
+
+        if user_doc is None:
+            return None, 0
+
+        return user_doc.get('level'), user_doc.get('vocabulary_version', 0)
+
+    def is_word_implicitly_known(self, user_id, word):
+        level = self.get_user_level(user_id)
+
+        return self.get_main_vocabulary_snapshot().is_word_below_level(word, level)
+
+    def get_user_vocabulary_version(self, user_id):
+        user_doc = self.users_vocabulary_collection.find_one({'_user_id': user_id},
+                                                             {'vocabulary_version': 1, '_id': 0})
+
+        return user_doc.get('vocabulary_version', 0) if user_doc else 0
 
-        return result.get('vocabulary', []) if result else []
+    def get_user_sampling_state(self, user_id, known_version=None):
+        pipeline = [
+            {"$match": {"_user_id": user_id}},
+            {"$project": {
+                "level": 1,
+                "vocabulary_version": {"$ifNull": ["$vocabulary_version", 0]},
+                "words": {
+                    "$cond": [
+                        {"$eq": [{"$ifNull": ["$vocabulary_version", 0]}, known_version]},
+                        "$$REMOVE",
+                        {"$ifNull": ["$vocabulary.word", []]}
+                    ]
+                },
+                "_id": 0
+            }}
+        ]
+
+        result = list(self.users_vocabulary_collection.aggregate(pipeline))
+
+        return result[0] if result else None
+
+    def invalidate_user_vocabulary(self, user_id):
+        self.user_vocabulary_cache.invalidate(user_id)
 
     def get_user_level(self, user_id):
-        user_doc = self.users_vocabulary_collection.find_one({'_user_id': user_id})
+        user_doc = self.users_vocabulary_collection.find_one({'_user_id': user_id}, {'level': 1})
 
         if user_doc:
             return user_doc.get('level', None)
@@ -59,29 +263,125 @@ class MongoDbClient:
                 return list(user_vocabulary)[0]['vocabulary']
         return []
 
+    def get_user_vocabulary_words(self, user_id, words):
+        pipeline = [
+            {"$match": {"_user_id": user_id}},
+            {"$project": {
+                "vocabulary": {
+                    "$filter": {
+                        "input": {"$ifNull": ["$vocabulary", []]},
+                        "as": "word",
+                        "cond": {"$in": ["$$word.word", {"$literal": words}]}
+                    }
+                },
+                "_id": 0
+            }}
+        ]
+
+        result = list(self.users_vocabulary_collection.aggregate(pipeline))
+
+        return result[0]['vocabulary'] if result else []
+
+    def iter_users_learning_vocabulary(self, batch_size):
+        pipeline = [
+            {"$project": {
+                "_user_id": 1,
+                "vocabulary_version": {"$ifNull": ["$vocabulary_version", 0]},
+                "vocabulary": {
+                    "$filter": {
+                        "input": {"$ifNull": ["$vocabulary", []]},
+                        "as": "word",
+                        "cond": {"$eq": ["$$word.is_word_learnt", False]}
+                    }
+                },
+                "_id": 0
+            }}
+        ]
+
+        chunk = []
+        for user_doc in self.users_vocabulary_collection.aggregate(pipeline, batchSize=batch_size):
+            chunk.append(user_doc)
+
+            if len(chunk) >= batch_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def get_relearn_queue(self, user_id):
+        result = self.relearn_queues_collection.find_one({'_user_id': user_id}, {'_id': 0})
+
+        return result
+
+    def save_relearn_queues(self, queues):
+        known_users = set(self.users_vocabulary_collection.distinct(
+            '_user_id', {'_user_id': {'$in': [queue['_user_id'] for queue in queues]}})) if queues else set()
+        queues = [queue for queue in queues if queue['_user_id'] in known_users]
+
+        if not queues:
+            return 0
+
+        result = self.relearn_queues_collection.bulk_write(
+            [ReplaceOne({'_user_id': queue['_user_id']}, queue, upsert=True) for queue in queues], ordered=False)
+
+        return result.upserted_count + result.modified_count
+
     def check_if_word_exists_in_user_vocabulary(self, word, user_id):
-        query = {
-            '_user_id': user_id,
-            'vocabulary.word': word
+        projection = {
+            'level': 1,
+            'vocabulary': {'$elemMatch': {'word': word}}
         }
-        result = self.users_vocabulary_collection.find_one(query)
+        result = self.users_vocabulary_collection.find_one({'_user_id': user_id}, projection)
+
+        if result is None:
+            return False
 
-        return result is not None
+        return bool(result.get('vocabulary')) or self.get_main_vocabulary_snapshot().is_word_below_level(
+            word, result.get('level'))
 
     def add_word_to_user_vocabulary(self, row, user_id):
-        self.users_vocabulary_collection.update_one({"_user_id": user_id}, {"$push": {"vocabulary": row}}, upsert=True)
+        self.users_vocabulary_collection.update_one({"_user_id": user_id},
+                                                    {"$push": {"vocabulary": row}, "$inc": {"vocabulary_version": 1}},
+                                                    upsert=True)
+        self.invalidate_user_vocabulary(user_id)
+
+    def push_word_if_absent(self, row, user_id):
+        result = self.users_vocabulary_collection.update_one(
+            {'_user_id': user_id, 'vocabulary.word': {'$ne': row['word']},
+             'level': {'$nin': self.get_levels_implying_word(row['word'])}},
+            {'$push': {'vocabulary': row}, '$inc': {'vocabulary_version': 1}})
+
+        return result.matched_count > 0
+
+    def insert_user_with_word(self, row, user_id):
+        try:
+            result = self.users_vocabulary_collection.update_one(
+                {'_user_id': user_id}, {'$setOnInsert': {'vocabulary': [row], 'vocabulary_version': 1}}, upsert=True)
+        except DuplicateKeyError:
+            return False
+
+        return result.upserted_id is not None
+
+    def add_word_if_absent(self, row, user_id):
+        self.ensure_indexes()
+        is_word_added = (self.push_word_if_absent(row, user_id) or self.insert_user_with_word(row, user_id)
+                         or self.push_word_if_absent(row, user_id))
+        self.invalidate_user_vocabulary(user_id)
+
+        return is_word_added
 
     def set_user_level(self, user_id, level):
-        doc = self.users_vocabulary_collection.find_one({"_user_id": user_id})
-        if doc:
-            self.users_vocabulary_collection.update_one({"_id": doc["_id"]}, {"$set": {"level": level}})
-        else:
-            new_document = {"_user_id": user_id, "level": level}
-            self.users_vocabulary_collection.insert_one(new_document)
+        self.ensure_indexes()
+        self.users_vocabulary_collection.update_one({"_user_id": user_id},
+                                                    {"$set": {"level": level}, "$inc": {"vocabulary_version": 1}},
+                                                    upsert=True)
+        self.invalidate_user_vocabulary(user_id)
 
     def add_words_array_to_user_vocabulary(self, user_id, words):
         result = self.users_vocabulary_collection.update_one(
-            {"_user_id": user_id}, {"$push": {"vocabulary": {"$each": words}}})
+            {"_user_id": user_id}, {"$push": {"vocabulary": {"$each": words}}, "$inc": {"vocabulary_version": 1}})
+        self.invalidate_user_vocabulary(user_id)
 
         if result.modified_count > 0:
             return True
@@ -89,7 +389,7 @@ class MongoDbClient:
             return False
 
     def get_words_by_level(self, level):
-        result = self.main_vocabulary_collection.find({"level": level})
+        result = self.main_vocabulary_store.get_words_by_level(level)
 
         return result
 
@@ -108,7 +408,8 @@ class MongoDbClient:
             },
             "$inc": {
                 "vocabulary.$.history_seen": 1,
-                "vocabulary.$.history_correct": int(repetition_result)
+                "vocabulary.$.history_correct": int(repetition_result),
+                "vocabulary_version": 1
             }
         }
 
@@ -116,12 +417,88 @@ class MongoDbClient:
             filter_criteria,
             update_operation,
         )
+        self.invalidate_user_vocabulary(user_id)
 
         if update_result is not None:
             return True
         else:
             return False
 
+    def update_repetition_result(self, user_id, word, repetition_result):
+        fields = get_repetition_fields('$$entry.', repetition_result, datetime.now())
+        is_matching_entry = {'$and': [{'$eq': ['$$entry.word', {'$literal': word}]},
+                                      {'$eq': ['$$entry.is_word_learnt', False]}]}
+
+        result = self.users_vocabulary_collection.update_one(
+            {'_user_id': user_id, 'vocabulary': {'$elemMatch': {'word': word, 'is_word_learnt': False}}},
+            [{'$set': {
+                'vocabulary': {'$map': {
+                    'input': '$vocabulary',
+                    'as': 'entry',
+                    'in': {'$cond': [is_matching_entry, {'$mergeObjects': ['$$entry', fields]}, '$$entry']}
+                }},
+                'vocabulary_version': {'$add': [{'$ifNull': ['$vocabulary_version', 0]}, 1]}
+            }}]
+        )
+        self.invalidate_user_vocabulary(user_id)
+
+        return result.matched_count > 0
+
+    def apply_repetition_states(self, user_id, states):
+        if not states:
+            return set()
+
+        operations = [UpdateOne(
+            {'_user_id': user_id, 'vocabulary': {'$elemMatch': {'word': state['word'], 'time_seen': previous_time_seen,
+                                                                'is_word_learnt': False}}},
+            {'$set': {f'vocabulary.$.{field}': state[field] for field in REPETITION_FIELDS},
+             '$inc': {'vocabulary_version': 1}}
+        ) for previous_time_seen, state in states]
+
+        result = self.users_vocabulary_collection.bulk_write(operations, ordered=False)
+        self.invalidate_user_vocabulary(user_id)
+
+        return self.get_applied_words(user_id, states, result.matched_count)
+
+    def get_applied_words(self, user_id, states, matched_count):
+        if matched_count == len(states):
+            return {state['word'] for _, state in states}
+
+        entries = {entry['word']: entry for entry in self.get_user_vocabulary_words(
+            user_id, [state['word'] for _, state in states])}
+
+        return {state['word'] for _, state in states
+                if all(entries.get(state['word'], {}).get(field) == state[field] for field in REPETITION_FIELDS)}
+
+    def toggle_word_status(self, user_id, word):
+        implying_levels = self.get_levels_implying_word(word)
+        has_entry = {'$in': [{'$literal': word}, {'$ifNull': ['$vocabulary.word', []]}]}
+        toggled_vocabulary = {'$map': {
+            'input': '$vocabulary',
+            'as': 'entry',
+            'in': {'$cond': [
+                {'$eq': ['$$entry.word', {'$literal': word}]},
+                {'$mergeObjects': ['$$entry', {'is_word_learnt': {'$not': ['$$entry.is_word_learnt']}}]},
+                '$$entry'
+            ]}
+        }}
+        unlearnt_vocabulary = {'$concatArrays': [{'$ifNull': ['$vocabulary', []]},
+                                                 [{'word': {'$literal': word}, 'is_word_learnt': False}]]}
+
+        result = self.users_vocabulary_collection.update_one(
+            {'_user_id': user_id, '$or': [{'vocabulary.word': word}, {'level': {'$in': implying_levels}}]},
+            [{'$set': {
+                'vocabulary': {'$cond': [has_entry, toggled_vocabulary, unlearnt_vocabulary]},
+                'vocabulary_version': {'$add': [{'$ifNull': ['$vocabulary_version', 0]}, 1]}
+            }}]
+        )
+        self.invalidate_user_vocabulary(user_id)
+
+        if result.matched_count == 0:
+            return 0
+
+        return 1
+
     def get_user_vocabulary_word(self, user_id, word):
         result = self.users_vocabulary_collection.find_one({"_user_id": user_id, "vocabulary.word": word})
 
@@ -134,9 +511,10 @@ class MongoDbClient:
                 'vocabulary.word': word
             },
             {
-                '$inc': {'vocabulary.$.history_seen': 1}
+                '$inc': {'vocabulary.$.history_seen': 1, 'vocabulary_version': 1}
             }
         )
+        self.invalidate_user_vocabulary(user_id)
 
         if result.matched_count == 0:
             return 0
@@ -150,9 +528,11 @@ class MongoDbClient:
                 'vocabulary.word': word
             },
             {
-                '$set': {'vocabulary.$.is_word_learnt': new_status}
+                '$set': {'vocabulary.$.is_word_learnt': new_status},
+                '$inc': {'vocabulary_version': 1}
             }
         )
+        self.invalidate_user_vocabulary(user_id)
 
         if result.matched_count == 0:
             return 0
@@ -0,0 +1,244 @@
+from datetime import datetime
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from dbClient.MongoDbClient import MongoDbClient, REPETITION_FIELDS, get_repetition_fields, get_vocabulary_entry_filter
+
+WORD_PROJECTION = {'_id': 0, '_user_id': 0}
+
+
+class PerWordMongoDbClient(MongoDbClient):
+    def __init__(self, db_name=None):
+        super().__init__(db_name)
+        users_vocabulary_words_collection_name = 'users_vocabulary_words'
+        self.users_vocabulary_words_collection = self.db[users_vocabulary_words_collection_name]
+
+    def create_indexes(self):
+        super().create_indexes()
+        self.users_vocabulary_words_collection.create_index([('_user_id', ASCENDING), ('word', ASCENDING)],
+                                                            unique=True)
+
+    def bump_user_vocabulary_version(self, user_id):
+        self.users_vocabulary_collection.update_one({'_user_id': user_id}, {'$inc': {'vocabulary_version': 1}},
+                                                    upsert=True)
+        self.invalidate_user_vocabulary(user_id)
+
+    def bump_version_unless_implied(self, user_id, word):
+        result = self.users_vocabulary_collection.update_one(
+            {'_user_id': user_id, 'level': {'$nin': self.get_levels_implying_word(word)}},
+            {'$inc': {'vocabulary_version': 1}})
+
+        return result.matched_count > 0
+
+    def insert_user_if_absent(self, user_id):
+        try:
+            result = self.users_vocabulary_collection.update_one(
+                {'_user_id': user_id}, {'$setOnInsert': {'vocabulary_version': 1}}, upsert=True)
+        except DuplicateKeyError:
+            return False
+
+        return result.upserted_id is not None
+
+    def get_user_vocabulary(self, user_id):
+        level = self.get_user_level(user_id)
+        vocabulary = list(self.users_vocabulary_words_collection.find({'_user_id': user_id}, WORD_PROJECTION))
+
+        return self.merge_implicit_known_words(vocabulary, level)
+
+    def find_user_vocabulary_entries(self, user_id, cursor, learnt, prefix, limit, batch_size):
+        entry_filter = dict(get_vocabulary_entry_filter(cursor, learnt, prefix), _user_id=user_id)
+
+        return self.users_vocabulary_words_collection.find(entry_filter, {'word': 1, 'is_word_learnt': 1, '_id': 0},
+                                                           sort=[('word', ASCENDING)], limit=limit or 0,
+                                                           batch_size=batch_size)
+
+    def get_user_sampling_state(self, user_id, known_version=None):
+        user_doc = self.users_vocabulary_collection.find_one({'_user_id': user_id},
+                                                             {'level': 1, 'vocabulary_version': 1, '_id': 0})
+
+        if user_doc is None:
+            return None
+
+        state = {'level': user_doc.get('level'), 'vocabulary_version': user_doc.get('vocabulary_version', 0)}
+
+        if state['vocabulary_version'] != known_version:
+            state['words'] = [word_doc['word'] for word_doc in self.users_vocabulary_words_collection.find(
+                {'_user_id': user_id}, {'word': 1, '_id': 0})]
+
+        return state
+
+    def get_user_learning_vocabulary(self, user_id):
+        result = list(self.users_vocabulary_words_collection.find({'_user_id': user_id, 'is_word_learnt': False},
+                                                                  WORD_PROJECTION))
+
+        return result
+
+    def get_user_vocabulary_words(self, user_id, words):
+        result = list(self.users_vocabulary_words_collection.find({'_user_id': user_id, 'word': {'$in': words}},
+                                                                  WORD_PROJECTION))
+
+        return result
+
+    def iter_users_learning_vocabulary(self, batch_size):
+        user_docs = self.users_vocabulary_collection.find(
+            {}, {'_user_id': 1, 'vocabulary_version': 1, '_id': 0}, batch_size=batch_size)
+
+        chunk = []
+        for user_doc in user_docs:
+            chunk.append({'_user_id': user_doc['_user_id'],
+                          'vocabulary_version': user_doc.get('vocabulary_version', 0),
+                          'vocabulary': []})
+
+            if len(chunk) >= batch_size:
+                yield self.fill_learning_vocabulary(chunk)
+                chunk = []
+
+        if chunk:
+            yield self.fill_learning_vocabulary(chunk)
+
+    def fill_learning_vocabulary(self, chunk):
+        users = {user_doc['_user_id']: user_doc for user_doc in chunk}
+        word_docs = self.users_vocabulary_words_collection.find(
+            {'_user_id': {'$in': list(users)}, 'is_word_learnt': False}, {'_id': 0})
+
+        for word_doc in word_docs:
+            users[word_doc.pop('_user_id')]['vocabulary'].append(word_doc)
+
+        return chunk
+
+    def check_if_word_exists_in_user_vocabulary(self, word, user_id):
+        if self.users_vocabulary_words_collection.find_one({'_user_id': user_id, 'word': word}, {'_id': 1}):
+            return True
+
+        return self.is_word_implicitly_known(user_id, word)
+
+    def add_word_to_user_vocabulary(self, row, user_id):
+        self.users_vocabulary_words_collection.update_one({'_user_id': user_id, 'word': row['word']},
+                                                          {'$setOnInsert': row}, upsert=True)
+        self.bump_user_vocabulary_version(user_id)
+
+    def add_word_if_absent(self, row, user_id):
+        self.ensure_indexes()
+
+        try:
+            result = self.users_vocabulary_words_collection.update_one({'_user_id': user_id, 'word': row['word']},
+                                                                       {'$setOnInsert': row}, upsert=True)
+        except DuplicateKeyError:
+            return False
+
+        if result.upserted_id is None:
+            return False
+
+        is_word_added = (self.bump_version_unless_implied(user_id, row['word']) or self.insert_user_if_absent(user_id)
+                         or self.bump_version_unless_implied(user_id, row['word']))
+
+        if not is_word_added:
+            self.users_vocabulary_words_collection.delete_one({'_user_id': user_id, 'word': row['word']})
+            return False
+
+        self.invalidate_user_vocabulary(user_id)
+
+        return True
+
+    def add_words_array_to_user_vocabulary(self, user_id, words):
+        if not words:
+            return False
+
+        result = self.users_vocabulary_words_collection.bulk_write(
+            [UpdateOne({'_user_id': user_id, 'word': row['word']}, {'$setOnInsert': row}, upsert=True)
+             for row in words], ordered=False)
+        self.bump_user_vocabulary_version(user_id)
+
+        return result.upserted_count > 0
+
+    def update_user_vocabulary_word(self, user_id, word, repetition_result, is_word_learnt):
+        new_time_seen = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        update_result = self.users_vocabulary_words_collection.find_one_and_update(
+            {'_user_id': user_id, 'word': word},
+            {
+                '$set': {'time_seen': new_time_seen, 'is_word_learnt': is_word_learnt},
+                '$inc': {'history_seen': 1, 'history_correct': int(repetition_result)}
+            },
+            projection={'_id': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+
+        if update_result is None:
+            return False
+
+        self.bump_user_vocabulary_version(user_id)
+
+        return True
+
+    def update_repetition_result(self, user_id, word, repetition_result):
+        result = self.users_vocabulary_words_collection.update_one(
+            {'_user_id': user_id, 'word': word, 'is_word_learnt': False},
+            [{'$set': get_repetition_fields('$', repetition_result, datetime.now())}])
+
+        if result.matched_count == 0:
+            return False
+
+        self.bump_user_vocabulary_version(user_id)
+
+        return True
+
+    def apply_repetition_states(self, user_id, states):
+        if not states:
+            return set()
+
+        operations = [UpdateOne(
+            {'_user_id': user_id, 'word': state['word'], 'time_seen': previous_time_seen, 'is_word_learnt': False},
+            {'$set': {field: state[field] for field in REPETITION_FIELDS}}
+        ) for previous_time_seen, state in states]
+
+        result = self.users_vocabulary_words_collection.bulk_write(operations, ordered=False)
+
+        if result.matched_count > 0:
+            self.bump_user_vocabulary_version(user_id)
+
+        return self.get_applied_words(user_id, states, result.matched_count)
+
+    def toggle_word_status(self, user_id, word):
+        result = self.users_vocabulary_words_collection.update_one(
+            {'_user_id': user_id, 'word': word}, [{'$set': {'is_word_learnt': {'$not': ['$is_word_learnt']}}}])
+
+        if result.matched_count == 0:
+            if not self.is_word_implicitly_known(user_id, word):
+                return 0
+
+            self.users_vocabulary_words_collection.update_one({'_user_id': user_id, 'word': word},
+                                                              {'$setOnInsert': {'word': word, 'is_word_learnt': False}},
+                                                              upsert=True)
+
+        self.bump_user_vocabulary_version(user_id)
+
+        return 1
+
+    def get_user_vocabulary_word(self, user_id, word):
+        result = self.users_vocabulary_words_collection.find_one({'_user_id': user_id, 'word': word}, WORD_PROJECTION)
+
+        return result
+
+    def increment_word_history_seen(self, user_id, word):
+        result = self.users_vocabulary_words_collection.update_one({'_user_id': user_id, 'word': word},
+                                                                   {'$inc': {'history_seen': 1}})
+
+        if result.matched_count == 0:
+            return 0
+
+        self.bump_user_vocabulary_version(user_id)
+
+        return 1
+
+    def update_word_status(self, user_id, word, new_status):
+        result = self.users_vocabulary_words_collection.update_one({'_user_id': user_id, 'word': word},
+                                                                   {'$set': {'is_word_learnt': new_status}})
+
+        if result.matched_count == 0:
+            return 0
+
+        self.bump_user_vocabulary_version(user_id)
+
+        return 1
@@ -0,0 +1,33 @@
+import threading
+
+from constants import VOCABULARY_STORAGE
+from dbClient.MongoDbClient import MongoDbClient
+from dbClient.PerWordMongoDbClient import PerWordMongoDbClient
+
+STORAGE_BACKENDS = {
+    'embedded': MongoDbClient,
+    'per_word': PerWordMongoDbClient
+}
+
+db_client = None
+db_client_lock = threading.Lock()
+
+
+def create_db_client(storage=None, db_name=None):
+    storage = storage or VOCABULARY_STORAGE
+
+    if storage not in STORAGE_BACKENDS:
+        raise ValueError(f'Unknown vocabulary storage: {storage}')
+
+    return STORAGE_BACKENDS[storage](db_name)
+
+
+def get_db_client():
+    global db_client
+
+    if db_client is None:
+        with db_client_lock:
+            if db_client is None:
+                db_client = create_db_client()
+
+    return db_client
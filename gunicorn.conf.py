@@ -0,0 +1,22 @@
+import os
+
+preload_app = os.getenv('PRELOAD_SHARED_MODELS', '0') == '1'
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import main
+
+        if main.LOAD_MODELS_IN_BACKGROUND:
+            main.start_loading()
+
+
+def on_starting(server):
+    metrics_dir = os.getenv('METRICS_DIR')
+
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+
+        for file_name in os.listdir(metrics_dir):
+            if file_name.startswith('metrics-'):
+                os.remove(os.path.join(metrics_dir, file_name))
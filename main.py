@@ -1,19 +1,69 @@
 import os
-import random
+import time
 
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 
-from constants import WORDS_AMOUNT_TO_RELEARN
+from constants import (LOAD_MODELS_IN_BACKGROUND, PRELOAD_SHARED_MODELS, PROFILING_TOKEN, PROFILE_ROUTES, PROFILES_DIR,
+                       PROFILES_TO_KEEP)
+from models.inferenceBatcher import InferenceTimeoutError
 from services.LearnWordsService import LearnWordsService
 from services.PredictWordsService import PredictWordsService
+from utils.Metrics import metrics
+from utils.RequestProfiler import RequestProfiler
 
 learnWordsService = LearnWordsService()
 predictWordsService = PredictWordsService()
 
+
+def start_loading():
+    learnWordsService.start_loading()
+    predictWordsService.start_loading()
+
+
+if PRELOAD_SHARED_MODELS:
+    predictWordsService.preload_shared()
+elif LOAD_MODELS_IN_BACKGROUND:
+    start_loading()
+
 app = Flask(__name__)
 CORS(app)
+query_monitor = learnWordsService.mongoClient.query_monitor
+requestProfiler = RequestProfiler(PROFILES_DIR, PROFILES_TO_KEEP, PROFILING_TOKEN, PROFILE_ROUTES)
+
+
+@app.before_request
+def begin_request_monitoring():
+    g.request_started_at = time.perf_counter()
+    query_monitor.begin_request(request.url_rule.rule if request.url_rule else None)
+
+    if requestProfiler.enabled and request.url_rule and requestProfiler.should_profile(
+            request.url_rule.rule, request.headers.get('X-Profile-Token')):
+        g.profile = requestProfiler.start()
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('request_duration_seconds', (('route', route), ('method', request.method)),
+                    time.perf_counter() - g.request_started_at)
+    metrics.increment('requests_total', (('route', route), ('method', request.method),
+                                         ('status', response.status_code)))
+
+    if response.status_code >= 500:
+        metrics.increment('request_errors_total', (('route', route), ('method', request.method)))
+
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Profile-Id'] = requestProfiler.stop(profile, route, request.method, response.status_code)
+
+    return response
+
+
+@app.teardown_request
+def end_request_monitoring(exception):
+    query_monitor.end_request()
 
 
 @app.route('/predict', methods=['POST'])
@@ -24,6 +74,8 @@ def predict():
     try:
         predictions = predictWordsService.predict_next_words(text, num_words)
         return jsonify({'predictions': predictions})
+    except InferenceTimeoutError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)})
 
@@ -37,10 +89,79 @@ def predict_synonyms():
     try:
         predictions = predictWordsService.predict_next_words_with_synonyms(user_id, text, num_words)
         return jsonify({'predictions': predictions})
+    except InferenceTimeoutError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)})
 
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({
+        'status': 'ok',
+        'components': {
+            'learn_words_service': learnWordsService.get_status(),
+            'predict_words_service': predictWordsService.get_status()
+        }
+    }), 200
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    learnWordsService.retry_loading()
+    predictWordsService.retry_loading()
+    is_ready = learnWordsService.is_ready() and predictWordsService.is_ready()
+    response = {
+        'ready': is_ready,
+        'components': {
+            'learn_words_service': learnWordsService.get_status(),
+            'predict_words_service': predictWordsService.get_status()
+        }
+    }
+
+    return jsonify(response), 200 if is_ready else 503
+
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        'inference_batcher': predictWordsService.get_inference_stats(),
+        'prediction_cache': predictWordsService.get_prediction_cache_stats(),
+        'vocabulary_cache': predictWordsService.get_vocabulary_cache_stats(),
+        'seen_words_cache': learnWordsService.get_seen_words_cache_stats(),
+        'main_vocabulary': learnWordsService.get_main_vocabulary_status(),
+        'db_indexes': learnWordsService.get_index_status(),
+        'queries': query_monitor.get_stats()
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not requestProfiler.is_admin(request.headers.get('X-Profile-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+
+    return jsonify({'profiles': requestProfiler.get_summaries()}), 200
+
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    if not requestProfiler.is_admin(request.headers.get('X-Profile-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+
+    extension = '.json' if request.args.get('format') == 'json' else '.prof'
+    path = requestProfiler.get_path(profile_id, extension)
+
+    if path is None:
+        return jsonify({'error': f"Profile '{profile_id}' not found"}), 404
+
+    return send_file(path, as_attachment=extension == '.prof', download_name=profile_id + extension)
+
+
 @app.route('/set_user_level', methods=['POST'])
 def set_level():
     request_data = request.get_json()
@@ -56,26 +177,11 @@ def set_level():
 def get_new_word_to_learn():
     user_id = request.args.get('user_id')
 
-    user_level = learnWordsService.get_user_level(user_id)
-    level_vocabulary = learnWordsService.get_words_by_level(user_level)
-    user_vocabulary = learnWordsService.get_user_vocabulary(user_level)
-
-    user_words_set = set(word['word'] for word in user_vocabulary)
-    level_vocabulary_set = set(word['Word'] for word in level_vocabulary)
-
-    filtered_level_vocabulary = [word for word in level_vocabulary_set if word not in user_words_set]
-
-    if filtered_level_vocabulary:
-        random_word = random.choice(filtered_level_vocabulary)
-
-        word_exists = learnWordsService.check_if_word_exists_in_user_vocabulary(random_word, user_id)
+    word_doc = learnWordsService.sample_unseen_word(user_id)
 
-        if not word_exists:
-            definition = learnWordsService.get_word_definition(random_word)
-            level = learnWordsService.get_word_level(random_word)
-            return jsonify({"word": random_word, "definition": definition, "level": level}), 200
-        else:
-            return jsonify({"error": f"Word '{random_word}' already exists in user vocabulary."}), 404
+    if word_doc:
+        return jsonify({"word": word_doc['Word'], "definition": word_doc.get('Definitions'),
+                        "level": word_doc.get('level')}), 200
     else:
         return jsonify({"error": f"There are no words to learn"}), 404
 
@@ -103,29 +209,15 @@ def learn_word():
 def get_words_to_relearn():
     user_id = request.args.get('user_id')
 
-    user_vocabulary = learnWordsService.get_user_learning_vocabulary(user_id)
-
-    if not user_vocabulary:
-        return jsonify({'massage': 'User has no words to relearn'}), 200
-
-    words_for_log_model = learnWordsService.prepare_words_for_log_model(user_vocabulary)
+    relearn_queue = learnWordsService.get_relearn_queue(user_id)
 
-    if len(words_for_log_model) < 1:
+    if relearn_queue['candidates_count'] < 1:
         return jsonify({'massage': 'User has no words to relearn'}), 200
 
-    words_to_learn = learnWordsService.get_words_to_learn(words_for_log_model)
-
-    if not words_to_learn:
+    if not relearn_queue['words']:
         return jsonify({'massage': 'User has no words to relearn. All words have high probability'}), 200
 
-    sorted_data = sorted(words_to_learn, key=lambda x: x['probability'], reverse=False)
-
-    sorted_word_array = [{'word': d['word']} for d in sorted_data]
-
-    if len(sorted_word_array) <= WORDS_AMOUNT_TO_RELEARN:
-        result_array = sorted_word_array
-    else:
-        result_array = sorted_word_array[:WORDS_AMOUNT_TO_RELEARN]
+    result_array = [{'word': item['word']} for item in relearn_queue['words']]
 
     for item in result_array:
         word = item["word"]
@@ -152,6 +244,20 @@ def handle_word_relearn_result():
         return jsonify({'error': 'Error occurred while saving the repetition result'}), 404
 
 
+@app.route('/relearn_session', methods=['POST'])
+def handle_relearn_session():
+    request_data = request.get_json()
+    user_id = request_data.get('user_id')
+    events = request_data.get('events')
+
+    try:
+        results = learnWordsService.apply_relearn_session(user_id, events)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'results': results}), 200
+
+
 @app.route('/set_word_as_known', methods=['POST'])
 def set_word_as_known():
     request_data = request.get_json()
@@ -168,18 +274,32 @@ def set_word_as_known():
         return jsonify({"error": f"Word '{new_row['word']}' already exists in user vocabulary."}), 404
 
 
-@app.route('/get_user_vocabulary', methods=['POST'])
+@app.route('/get_user_vocabulary', methods=['GET', 'POST'])
 def get_user_vocabulary():
-    data = request.json
+    data = request.args if request.method == 'GET' else request.json
     user_id = data['user_id']
 
     try:
-        user_vocabulary = predictWordsService.get_user_vocabulary(user_id)
-        result = [{'word': entry['word'], 'is_word_learnt': entry['is_word_learnt']} for entry in user_vocabulary]
-        return result
+        query = learnWordsService.parse_vocabulary_query(data)
+        level, etag = learnWordsService.get_user_vocabulary_etag(user_id, query)
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif query['limit']:
+            words, next_cursor = learnWordsService.get_user_vocabulary_page(user_id, level, query)
+            response = jsonify({'words': words, 'next_cursor': next_cursor})
+        else:
+            response = Response(stream_with_context(learnWordsService.stream_user_vocabulary(user_id, level, query)),
+                                mimetype='application/json')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)})
 
+    response.set_etag(etag, weak=True)
+
+    return response
+
 
 @app.route('/increment_history_seen', methods=['POST'])
 def increment_history_seen():
@@ -204,17 +324,10 @@ def update_word_status():
     user_id = data['user_id']
     word = data['word']
 
-    user_vocabulary = learnWordsService.get_user_vocabulary(user_id)
-    word_entry = next((entry for entry in user_vocabulary if entry['word'] == word), None)
-
-    if word_entry:
-        new_status = not word_entry['is_word_learnt']
-        update_result = learnWordsService.update_word_status(user_id, word, new_status)
+    update_result = learnWordsService.toggle_word_status(user_id, word)
 
-        if update_result:
-            return jsonify({'message': f"Word '{word}' status updated successfully"})
-        else:
-            return jsonify({'error': 'Failed to update word status'})
+    if update_result:
+        return jsonify({'message': f"Word '{word}' status updated successfully"})
     else:
         return jsonify({'error': 'Word not found in user vocabulary'})
 
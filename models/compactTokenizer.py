@@ -0,0 +1,118 @@
+import json
+
+import numpy as np
+
+FORMAT_VERSION = 1
+TAIL_WINDOW = 256
+
+
+class CompactTokenizer:
+    def __init__(self, words, indices, filters, split=' ', lower=True, num_words=None, oov_token=None):
+        self.filters = filters
+        self.split = split
+        self.lower = lower
+        self.num_words = num_words
+        self.oov_token = oov_token
+        self.word_index = dict(zip(words, indices))
+        self.oov_index = self.word_index.get(oov_token) if oov_token is not None else None
+        self.translate_map = str.maketrans({character: split for character in filters})
+
+        self.index_word = np.full(max(indices, default=0) + 1, None, dtype=object)
+        for word, index in zip(words, indices):
+            if self.index_word[index] is None:
+                self.index_word[index] = word
+
+    def get_index(self, word):
+        index = self.word_index.get(word)
+
+        if index is None or (self.num_words and index >= self.num_words):
+            return self.oov_index
+
+        return index
+
+    def split_words(self, text):
+        return text.translate(self.translate_map).split(self.split)
+
+    def texts_to_sequences(self, texts):
+        sequences = []
+
+        for text in texts:
+            if self.lower:
+                text = text.lower()
+
+            indices = (self.get_index(word) for word in self.split_words(text) if word)
+            sequences.append([index for index in indices if index is not None])
+
+        return sequences
+
+    def tokenize_tail(self, text, maxlen):
+        if maxlen < 1:
+            return []
+
+        if self.lower:
+            text = text.lower()
+
+        window = TAIL_WINDOW
+        while True:
+            start = max(0, len(text) - window)
+            words = self.split_words(text[start:])
+
+            if start > 0:
+                words = words[1:]
+
+            sequence = []
+            for word in reversed(words):
+                index = self.get_index(word) if word else None
+
+                if index is not None:
+                    sequence.append(index)
+
+                    if len(sequence) == maxlen:
+                        break
+
+            if len(sequence) == maxlen or start == 0:
+                sequence.reverse()
+
+                return sequence
+
+            window *= 4
+
+
+def convert_keras_tokenizer(tokenizer):
+    if getattr(tokenizer, 'char_level', False) or getattr(tokenizer, 'analyzer', None) is not None:
+        raise ValueError('Only word level tokenizers without a custom analyzer can be converted')
+
+    items = sorted(tokenizer.word_index.items(), key=lambda item: item[1])
+
+    return CompactTokenizer([word for word, _ in items], [index for _, index in items], tokenizer.filters,
+                            tokenizer.split, tokenizer.lower, tokenizer.num_words, tokenizer.oov_token)
+
+
+def save_compact_tokenizer(tokenizer, path):
+    items = sorted(tokenizer.word_index.items(), key=lambda item: item[1])
+
+    if any(tokenizer.split in word for word, _ in items):
+        raise ValueError(f"Tokenizer words must not contain the split character '{tokenizer.split}'")
+
+    config = {'filters': tokenizer.filters, 'split': tokenizer.split, 'lower': tokenizer.lower,
+              'num_words': tokenizer.num_words, 'oov_token': tokenizer.oov_token}
+
+    with open(path, 'wb') as handle:
+        np.savez(handle,
+                 version=np.array(FORMAT_VERSION),
+                 config=np.frombuffer(json.dumps(config).encode('utf-8'), dtype=np.uint8),
+                 words=np.frombuffer(tokenizer.split.join(word for word, _ in items).encode('utf-8'), dtype=np.uint8),
+                 indices=np.array([index for _, index in items], dtype=np.int32))
+
+
+def load_compact_tokenizer(path):
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['version']) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact tokenizer version {int(data['version'])} in {path}")
+
+        config = json.loads(data['config'].tobytes().decode('utf-8'))
+        indices = data['indices'].tolist()
+        words = data['words'].tobytes().decode('utf-8').split(config['split']) if indices else []
+
+    return CompactTokenizer(words, indices, config['filters'], config['split'], config['lower'],
+                            config['num_words'], config['oov_token'])
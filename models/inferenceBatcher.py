@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+
+class InferenceTimeoutError(RuntimeError):
+    pass
+
+
+class InferenceBatcher:
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5, timeout=30.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000)
+        self.timeout = timeout
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.batches_count = 0
+            self.requests_count = 0
+            self.batch_size_histogram = {}
+            self.total_queue_wait = 0.0
+            self.max_queue_wait = 0.0
+            self.total_forward_time = 0.0
+
+    def ensure_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name='inference-batcher', daemon=True)
+                self.worker.start()
+
+    def submit(self, sequence):
+        future = Future()
+        self.ensure_worker()
+        self.requests.put((np.asarray(sequence), time.perf_counter(), future))
+
+        return future
+
+    def predict(self, sequence):
+        future = self.submit(sequence)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise InferenceTimeoutError(f'Inference did not finish within {self.timeout:g}s')
+
+    def collect_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout > 0:
+                    batch.append(self.requests.get(timeout=timeout))
+                else:
+                    batch.append(self.requests.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def drain(self):
+        batch = []
+
+        while True:
+            try:
+                batch.append(self.requests.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def fail_batch(self, batch, error):
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def run_batch(self, batch):
+        started_at = time.perf_counter()
+        predictions = self.predict_fn(np.vstack([sequence for sequence, _, _ in batch]))
+        forward_time = time.perf_counter() - started_at
+
+        if len(predictions) != len(batch):
+            raise ValueError(f'Model returned {len(predictions)} predictions for a batch of {len(batch)}')
+
+        self.record_batch(batch, started_at, forward_time)
+
+        for row, (_, _, future) in zip(predictions, batch):
+            future.set_result(row)
+
+    def run(self):
+        batch = []
+
+        try:
+            while True:
+                batch = [request for request in self.collect_batch() if request[2].set_running_or_notify_cancel()]
+
+                try:
+                    if batch:
+                        self.run_batch(batch)
+                except Exception as e:
+                    self.fail_batch(batch, e)
+        except BaseException:
+            self.fail_batch(batch + self.drain(), RuntimeError('Inference worker stopped'))
+            raise
+
+    def record_batch(self, batch, started_at, forward_time):
+        waits = [started_at - enqueued_at for _, enqueued_at, _ in batch]
+
+        with self.lock:
+            self.batches_count += 1
+            self.requests_count += len(batch)
+            self.batch_size_histogram[len(batch)] = self.batch_size_histogram.get(len(batch), 0) + 1
+            self.total_queue_wait += sum(waits)
+            self.max_queue_wait = max(self.max_queue_wait, max(waits))
+            self.total_forward_time += forward_time
+
+    def get_stats(self):
+        with self.lock:
+            batches_count = self.batches_count
+            requests_count = self.requests_count
+
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': batches_count,
+                'requests': requests_count,
+                'pending': self.requests.qsize(),
+                'mean_batch_size': requests_count / batches_count if batches_count else 0.0,
+                'batch_size_histogram': dict(sorted(self.batch_size_histogram.items())),
+                'mean_queue_wait_ms': self.total_queue_wait * 1000 / requests_count if requests_count else 0.0,
+                'max_queue_wait_ms': self.max_queue_wait * 1000,
+                'mean_forward_ms': self.total_forward_time * 1000 / batches_count if batches_count else 0.0,
+            }
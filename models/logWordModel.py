@@ -1,5 +1,3 @@
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
 import numpy as np
 import joblib
 
@@ -10,29 +8,30 @@ saved_scaler_name = "./saved_models/log_model_params.pkl"
 
 class LogWordModel:
     def __init__(self):
-        self.logModel = LogisticRegression()
-        self.scaler = StandardScaler()
+        self.coefficients = None
+        self.intercept = 0.0
         self.best_threshold = 0.5
         self.load_model(saved_model_name, saved_scaler_name)
 
     def load_model(self, scaler_file, model_file):
         scaler_params = joblib.load(scaler_file)
-        self.scaler.mean_ = scaler_params['mean']
-        self.scaler.scale_ = scaler_params['scale']
+        mean = np.asarray(scaler_params['mean'], dtype=np.float64)
+        scale = np.asarray(scaler_params['scale'], dtype=np.float64)
 
         model_params = joblib.load(model_file)
-        self.logModel.intercept_ = model_params['intercept']
-        self.logModel.coef_ = model_params['coefficients']
-        self.best_threshold = model_params['threshold']
-        self.logModel.classes_ = np.array([0, 1])
+        coefficients = np.asarray(model_params['coefficients'], dtype=np.float64).ravel()
+        intercept = float(np.asarray(model_params['intercept'], dtype=np.float64).ravel()[0])
+
+        self.coefficients = coefficients / scale
+        self.intercept = intercept - float(np.dot(self.coefficients, mean))
+        self.best_threshold = float(model_params['threshold'])
 
     def predict_probability(self, input_x):
-        predicted_probability = self.logModel.predict_proba(input_x)[:, 1]
+        decision = np.asarray(input_x, dtype=np.float64) @ self.coefficients + self.intercept
 
-        return predicted_probability
+        return 1.0 / (1.0 + np.exp(-decision))
 
     def predict_class(self, input_x):
-        input_x = self.scaler.transform(input_x)
         predicted_probability = self.predict_probability(input_x)
         predicted_y = (predicted_probability >= self.best_threshold).astype(int)
 
@@ -0,0 +1,204 @@
+import numpy as np
+
+from models.sharedWeights import load_arrays
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+def softmax(x):
+    x = np.exp(x - x.max(axis=-1, keepdims=True))
+
+    return x / x.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'tanh': np.tanh,
+    'sigmoid': sigmoid,
+    'hard_sigmoid': hard_sigmoid,
+    'softmax': softmax,
+}
+
+
+def get_activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation '{name}'")
+
+    return ACTIVATIONS[name]
+
+
+def lstm_step(x_t, state, weights, config):
+    h, c = state
+    units = config['units']
+    activation = get_activation(config['activation'])
+    recurrent_activation = get_activation(config['recurrent_activation'])
+
+    z = x_t + h @ weights[1]
+    i = recurrent_activation(z[:, :units])
+    f = recurrent_activation(z[:, units:2 * units])
+    c = f * c + i * activation(z[:, 2 * units:3 * units])
+    o = recurrent_activation(z[:, 3 * units:])
+    h = o * activation(c)
+
+    return h, (h, c)
+
+
+def gru_step(x_t, state, weights, config):
+    h, = state
+    units = config['units']
+    activation = get_activation(config['activation'])
+    recurrent_activation = get_activation(config['recurrent_activation'])
+    recurrent_kernel = weights[1]
+
+    if config.get('reset_after', True):
+        recurrent_bias = weights[2][1] if len(weights) > 2 else 0.0
+        h_z = h @ recurrent_kernel + recurrent_bias
+        z = recurrent_activation(x_t[:, :units] + h_z[:, :units])
+        r = recurrent_activation(x_t[:, units:2 * units] + h_z[:, units:2 * units])
+        hh = activation(x_t[:, 2 * units:] + r * h_z[:, 2 * units:])
+    else:
+        z = recurrent_activation(x_t[:, :units] + h @ recurrent_kernel[:, :units])
+        r = recurrent_activation(x_t[:, units:2 * units] + h @ recurrent_kernel[:, units:2 * units])
+        hh = activation(x_t[:, 2 * units:] + (r * h) @ recurrent_kernel[:, 2 * units:])
+
+    h = z * h + (1 - z) * hh
+
+    return h, (h,)
+
+
+def simple_rnn_step(x_t, state, weights, config):
+    h, = state
+    h = get_activation(config['activation'])(x_t + h @ weights[1])
+
+    return h, (h,)
+
+
+RNN_STEPS = {
+    'LSTM': (lstm_step, 2),
+    'GRU': (gru_step, 1),
+    'SimpleRNN': (simple_rnn_step, 1),
+}
+
+
+def project_inputs(x, layer_type, weights, config):
+    projected = x @ weights[0]
+
+    if not config.get('use_bias', True) or len(weights) < 3:
+        return projected
+
+    if layer_type == 'GRU' and config.get('reset_after', True):
+        return projected + weights[2][0]
+
+    return projected + weights[2]
+
+
+def run_rnn(x, mask, layer_type, weights, config, go_backwards=False, zero_output_for_mask=False):
+    step, states_count = RNN_STEPS[layer_type]
+    batch_size, timesteps = x.shape[:2]
+    units = config['units']
+
+    projected = project_inputs(x, layer_type, weights, config)
+    state = tuple(np.zeros((batch_size, units), dtype=x.dtype) for _ in range(states_count))
+    output = np.zeros((batch_size, units), dtype=x.dtype)
+    outputs = np.zeros((batch_size, timesteps, units), dtype=x.dtype)
+    steps = range(timesteps - 1, -1, -1) if go_backwards else range(timesteps)
+
+    for position, t in enumerate(steps):
+        new_output, new_state = step(projected[:, t], state, weights, config)
+
+        if mask is None:
+            output, state = new_output, new_state
+            outputs[:, position] = output
+        else:
+            keep = mask[:, t:t + 1]
+            output = np.where(keep, new_output, output)
+            state = tuple(np.where(keep, new, old) for new, old in zip(new_state, state))
+            outputs[:, position] = np.where(keep, output, 0.0) if zero_output_for_mask else output
+
+    if config.get('return_sequences', False):
+        return outputs[:, ::-1] if go_backwards else outputs
+
+    return output
+
+
+def merge_directions(forward, backward, merge_mode):
+    if merge_mode == 'concat':
+        return np.concatenate([forward, backward], axis=-1)
+    if merge_mode == 'sum':
+        return forward + backward
+    if merge_mode == 'mul':
+        return forward * backward
+    if merge_mode == 'ave':
+        return (forward + backward) / 2
+
+    raise ValueError(f"Unsupported Bidirectional merge_mode '{merge_mode}'")
+
+
+class NumpyLanguageModel:
+    def __init__(self, directory):
+        arrays, metadata = load_arrays(directory)
+
+        if 'next_word_model' not in metadata:
+            raise ValueError(f'No exported next-word model in {directory}')
+
+        self.layers = []
+        for layer in metadata['next_word_model']['layers']:
+            self.layers.append((layer['type'], layer['config'], [arrays[name] for name in layer['weights']]))
+
+        self.output_shape = tuple(metadata['next_word_model']['output_shape'])
+
+    def run_layer(self, x, mask, layer_type, config, weights):
+        if layer_type == 'Embedding':
+            mask = x != 0 if config.get('mask_zero', False) else None
+            return weights[0][x], mask
+
+        if layer_type in RNN_STEPS:
+            if config.get('go_backwards', False):
+                raise ValueError('go_backwards recurrent layers are only supported inside Bidirectional')
+            x = run_rnn(x, mask, layer_type, weights, config)
+            return x, mask if config.get('return_sequences', False) else None
+
+        if layer_type == 'Bidirectional':
+            inner_type = config['layer']['class_name']
+            inner_config = config['layer']['config']
+            half = len(weights) // 2
+            zero_output_for_mask = inner_config.get('return_sequences', False)
+            forward = run_rnn(x, mask, inner_type, weights[:half], inner_config,
+                              zero_output_for_mask=zero_output_for_mask)
+            backward = run_rnn(x, mask, inner_type, weights[half:], inner_config, go_backwards=True,
+                               zero_output_for_mask=zero_output_for_mask)
+            x = merge_directions(forward, backward, config.get('merge_mode', 'concat'))
+            return x, mask if inner_config.get('return_sequences', False) else None
+
+        if layer_type == 'Dense':
+            x = x @ weights[0]
+            if config.get('use_bias', True):
+                x = x + weights[1]
+            return get_activation(config.get('activation', 'linear'))(x), mask
+
+        if layer_type == 'Activation':
+            return get_activation(config['activation'])(x), mask
+
+        if layer_type == 'Flatten':
+            return x.reshape(len(x), -1), None
+
+        if layer_type in ('InputLayer', 'Dropout', 'SpatialDropout1D', 'GaussianNoise'):
+            return x, mask
+
+        raise ValueError(f"Unsupported layer type '{layer_type}'")
+
+    def predict_on_batch(self, sequences):
+        x = np.asarray(sequences)
+        mask = None
+
+        for layer_type, config, weights in self.layers:
+            x, mask = self.run_layer(x, mask, layer_type, config, weights)
+
+        return x.astype(np.float32, copy=False)
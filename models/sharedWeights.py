@@ -0,0 +1,57 @@
+import json
+import os
+import re
+
+import numpy as np
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def read_manifest(directory):
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+
+    if not os.path.exists(manifest_path):
+        return {'version': FORMAT_VERSION, 'metadata': {}, 'arrays': {}}
+
+    with open(manifest_path) as handle:
+        manifest = json.load(handle)
+
+    if manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported shared weights version {manifest.get('version')} in {directory}")
+
+    return manifest
+
+
+def save_arrays(directory, arrays, metadata=None):
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    manifest['metadata'].update(metadata or {})
+
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        file_name = re.sub(r'[^A-Za-z0-9_.-]', '_', name) + '.npy'
+        np.save(os.path.join(directory, file_name), array)
+        manifest['arrays'][name] = {'file': file_name, 'shape': list(array.shape), 'dtype': str(array.dtype)}
+
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    return manifest
+
+
+def load_arrays(directory, names=None):
+    manifest = read_manifest(directory)
+    names = list(manifest['arrays']) if names is None else names
+
+    arrays = {}
+    for name in names:
+        if name not in manifest['arrays']:
+            raise KeyError(f"Array '{name}' is not exported to {directory}")
+
+        entry = manifest['arrays'][name]
+        arrays[name] = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+
+    return arrays, manifest['metadata']
@@ -0,0 +1,202 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models.sharedWeights import load_arrays, read_manifest, save_arrays
+
+FORMAT_VERSION = 1
+ARRAY_NAMES = ('sources', 'targets', 'source_excluded', 'offsets', 'neighbours', 'scores', 'floors')
+
+
+def encode_words(words):
+    return np.frombuffer('\n'.join(words).encode('utf-8'), dtype=np.uint8)
+
+
+def decode_words(array):
+    return array.tobytes().decode('utf-8').split('\n') if len(array) else []
+
+
+def has_synonym_table(directory):
+    return 'synonym_table' in read_manifest(directory)['metadata']
+
+
+def get_row_orths(embedding):
+    return {row: orths for orths, rows in embedding.orth_rows.items() for row in rows}
+
+
+def find_neighbours(source_embedding, source_orths, target_embedding, rows, min_similarity, max_neighbours):
+    scores = source_embedding.matrix[rows] @ target_embedding.matrix.T
+    neighbours = []
+
+    for position, row in enumerate(rows):
+        row_scores = scores[position]
+        identical_rows = target_embedding.orth_rows.get(source_orths.get(row))
+
+        if identical_rows:
+            row_scores[identical_rows] = 1.0
+
+        if source_embedding.is_excluded[row]:
+            neighbours.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), min_similarity))
+            continue
+
+        candidates = np.flatnonzero((row_scores > min_similarity) & ~target_embedding.is_excluded)
+        candidates = candidates[np.argsort(-row_scores[candidates], kind='stable')]
+        floor = float(row_scores[candidates[max_neighbours]]) if len(candidates) > max_neighbours else min_similarity
+        candidates = candidates[:max_neighbours]
+        neighbours.append((candidates, row_scores[candidates], floor))
+
+    return neighbours
+
+
+def find_all_neighbours(source_embedding, target_embedding, min_similarity, max_neighbours, workers, chunk_size):
+    if not len(target_embedding):
+        return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), min_similarity)
+                for _ in range(len(source_embedding))]
+
+    source_orths = get_row_orths(source_embedding)
+    chunks = [np.arange(start, min(start + chunk_size, len(source_embedding)))
+              for start in range(0, len(source_embedding), chunk_size)]
+
+    with ThreadPoolExecutor(workers) as executor:
+        results = executor.map(lambda rows: find_neighbours(source_embedding, source_orths, target_embedding, rows,
+                                                            min_similarity, max_neighbours), chunks)
+
+        return [neighbours for chunk_neighbours in results for neighbours in chunk_neighbours]
+
+
+def merge_neighbours(neighbours, added_neighbours, max_neighbours):
+    indices, scores, floor = neighbours
+    added_indices, added_scores, added_floor = added_neighbours
+    floor = max(floor, added_floor)
+    is_kept = added_scores > floor
+
+    indices = np.concatenate([indices, added_indices[is_kept]])
+    scores = np.concatenate([scores, added_scores[is_kept]])
+    order = np.argsort(-scores, kind='stable')
+
+    if len(order) > max_neighbours:
+        floor = max(floor, float(scores[order[max_neighbours]]))
+        order = order[:max_neighbours]
+
+    return indices[order], scores[order], floor
+
+
+def update_neighbours(table, sources, targets, embed, min_similarity, max_neighbours, workers, chunk_size):
+    target_rows = {word: row for row, word in enumerate(targets)}
+    new_target_rows = np.array([target_rows.get(word, -1) for word in table.targets], dtype=np.int64)
+    kept_sources = [word for word in sources if word in table.source_rows]
+    added_sources = [word for word in sources if word not in table.source_rows]
+    added_targets = [word for word in targets if word not in table.target_rows]
+
+    neighbours = {}
+    source_excluded = {}
+    for word in kept_sources:
+        row = table.source_rows[word]
+        indices, scores, floor = table.get_neighbours(row)
+        indices = new_target_rows[indices]
+        neighbours[word] = (indices[indices >= 0], scores[indices >= 0], floor)
+        source_excluded[word] = bool(table.source_excluded[row])
+
+    if kept_sources and added_targets:
+        added_target_rows = np.array([target_rows[word] for word in added_targets], dtype=np.int64)
+        added_neighbours = find_all_neighbours(embed(kept_sources), embed(added_targets), min_similarity,
+                                               max_neighbours, workers, chunk_size)
+
+        for word, (indices, scores, floor) in zip(kept_sources, added_neighbours):
+            if not source_excluded[word]:
+                neighbours[word] = merge_neighbours(neighbours[word], (added_target_rows[indices], scores, floor),
+                                                    max_neighbours)
+
+    if added_sources:
+        added_source_embedding = embed(added_sources)
+        added_neighbours = find_all_neighbours(added_source_embedding, embed(targets), min_similarity,
+                                               max_neighbours, workers, chunk_size)
+
+        for word, word_neighbours, is_excluded in zip(added_sources, added_neighbours,
+                                                      added_source_embedding.is_excluded):
+            neighbours[word] = word_neighbours
+            source_excluded[word] = bool(is_excluded)
+
+    return ([neighbours[word] for word in sources], np.array([source_excluded[word] for word in sources], dtype=bool),
+            len(added_sources), len(added_targets))
+
+
+def save_synonym_table(directory, sources, targets, neighbours, source_excluded, metadata):
+    offsets = np.zeros(len(neighbours) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(indices) for indices, _, _ in neighbours])
+
+    arrays = {
+        'sources': encode_words(sources),
+        'targets': encode_words(targets),
+        'source_excluded': np.asarray(source_excluded, dtype=bool),
+        'offsets': offsets,
+        'neighbours': np.concatenate([indices for indices, _, _ in neighbours] + [np.empty(0)]).astype(np.int32),
+        'scores': np.concatenate([scores for _, scores, _ in neighbours] + [np.empty(0)]).astype(np.float32),
+        'floors': np.array([floor for _, _, floor in neighbours], dtype=np.float32)
+    }
+
+    save_arrays(directory, {f'synonym_table/{name}': array for name, array in arrays.items()},
+                {'synonym_table': dict(metadata, version=FORMAT_VERSION)})
+
+
+class SynonymTable:
+    def __init__(self, directory):
+        arrays, metadata = load_arrays(directory, [f'synonym_table/{name}' for name in ARRAY_NAMES])
+        self.metadata = metadata['synonym_table']
+
+        if self.metadata.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported synonym table version {self.metadata.get('version')} in {directory}")
+
+        self.sources = decode_words(arrays['synonym_table/sources'])
+        self.targets = decode_words(arrays['synonym_table/targets'])
+        self.source_rows = {word: row for row, word in enumerate(self.sources)}
+        self.target_rows = {word: row for row, word in enumerate(self.targets)}
+        self.source_excluded = arrays['synonym_table/source_excluded']
+        self.offsets = arrays['synonym_table/offsets']
+        self.neighbours = arrays['synonym_table/neighbours']
+        self.scores = arrays['synonym_table/scores']
+        self.floors = arrays['synonym_table/floors']
+
+    def __len__(self):
+        return len(self.sources)
+
+    def get_neighbours(self, row):
+        start, end = self.offsets[row], self.offsets[row + 1]
+
+        return np.asarray(self.neighbours[start:end], dtype=np.int64), np.asarray(self.scores[start:end]), \
+            float(self.floors[row])
+
+    def find_similar(self, words, vocabulary, threshold, amount):
+        if not vocabulary:
+            return [[] for _ in words]
+
+        if not vocabulary <= self.target_rows.keys():
+            return None
+
+        threshold = np.float32(threshold)
+        result = []
+        for word in words:
+            row = self.source_rows.get(word)
+
+            if row is None:
+                return None
+
+            if self.source_excluded[row]:
+                result.append([])
+                continue
+
+            start, end = self.offsets[row], self.offsets[row + 1]
+            synonyms = []
+            for target, score in zip(self.neighbours[start:end].tolist(), self.scores[start:end].tolist()):
+                if score <= threshold or len(synonyms) == amount:
+                    break
+
+                if self.targets[target] in vocabulary:
+                    synonyms.append((self.targets[target], score))
+
+            if len(synonyms) < amount and threshold < self.floors[row]:
+                return None
+
+            result.append(synonyms)
+
+        return result
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class VocabularyEmbedding:
+    def __init__(self, words, docs, exclude_tags):
+        self.words = list(words)
+        self.orth_rows = {}
+
+        vectors = []
+        is_excluded = []
+        for i, doc in enumerate(docs):
+            norm = doc.vector_norm
+            vectors.append(doc.vector / norm if norm else np.zeros_like(doc.vector))
+            is_excluded.append(len(doc) == 0 or doc[0].tag_ in exclude_tags)
+            self.orth_rows.setdefault(tuple(token.orth for token in doc), []).append(i)
+
+        self.matrix = np.array(vectors, dtype=np.float32).reshape(len(self.words), -1)
+        self.is_excluded = np.array(is_excluded, dtype=bool)
+
+    def __len__(self):
+        return len(self.words)
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes + self.is_excluded.nbytes + sum(len(word) for word in self.words)
+
+    def similarities(self, other):
+        scores = other.matrix @ self.matrix.T
+
+        for orths, other_rows in other.orth_rows.items():
+            rows = self.orth_rows.get(orths)
+            if rows:
+                for row in other_rows:
+                    scores[row, rows] = 1.0
+
+        return scores
+
+    def find_similar(self, other, threshold, amount):
+        if not len(self) or not len(other):
+            return [[] for _ in range(len(other))]
+
+        scores = self.similarities(other)
+        candidates = (scores > threshold) & ~self.is_excluded
+
+        result = []
+        for row in range(len(other)):
+            if other.is_excluded[row]:
+                result.append([])
+                continue
+
+            indices = np.flatnonzero(candidates[row])
+            indices = indices[np.argsort(-scores[row, indices], kind='stable')[:amount]]
+            result.append([(self.words[i], float(scores[row, i])) for i in indices])
+
+        return result
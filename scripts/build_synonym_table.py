@@ -0,0 +1,122 @@
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from constants import SYNONYM_TABLE_DIR, SYNONYM_EXCLUDE_TAGS, SYNONYMS_AMOUNT
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Precompute the nearest main vocabulary words of every tokenizer word. An existing table built '
+                    'with the same settings is updated incrementally for added and removed words.')
+    parser.add_argument('--mongodb-uri', default=None,
+                        help='MongoDB connection string, defaults to the MONGODB_URI environment variable')
+    parser.add_argument('--output-dir', default=SYNONYM_TABLE_DIR,
+                        help='Directory for the exported .npy files and manifest')
+    parser.add_argument('--min-similarity', type=float, default=0.5,
+                        help='Lowest similarity stored, requests with a lower threshold fall back to spaCy')
+    parser.add_argument('--max-neighbours', type=int, default=64, help='Neighbours stored per tokenizer word')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=256, help='Tokenizer words scored per worker task')
+    parser.add_argument('--full', action='store_true', help='Rebuild the whole table')
+    parser.add_argument('--check-samples', type=int, default=200,
+                        help='Tokenizer words compared against live spaCy similarity after the build')
+
+    return parser.parse_args()
+
+
+def check_table(predict_words_service, synonym_table, samples, min_similarity):
+    rng = random.Random(0)
+    vocabulary = rng.sample(synonym_table.targets, min(500, len(synonym_table.targets)))
+    words = rng.sample(synonym_table.sources, min(samples, len(synonym_table.sources)))
+    threshold = max(0.55, min_similarity)
+
+    expected = predict_words_service.embed_words(vocabulary).find_similar(
+        predict_words_service.embed_words(words), threshold, SYNONYMS_AMOUNT)
+    vocabulary = frozenset(vocabulary)
+
+    matches = 0
+    fallbacks = 0
+    for word, expected_synonyms in zip(words, expected):
+        found = synonym_table.find_similar([word], vocabulary, threshold, SYNONYMS_AMOUNT)
+
+        if found is None:
+            fallbacks += 1
+        elif [synonym for synonym, _ in found[0]] == [synonym for synonym, _ in expected_synonyms]:
+            matches += 1
+
+    return (f'check: {matches}/{len(words)} sampled words match live spaCy synonyms, {fallbacks} fall back to spaCy, '
+            f'at threshold {threshold}')
+
+
+def main():
+    args = parse_args()
+
+    if args.mongodb_uri:
+        os.environ['MONGODB_URI'] = args.mongodb_uri
+
+    from models.synonymTable import (SynonymTable, find_all_neighbours, has_synonym_table, save_synonym_table,
+                                     update_neighbours)
+    from models.vocabularyEmbedding import VocabularyEmbedding
+    from services.PredictWordsService import PredictWordsService
+
+    predict_words_service = PredictWordsService()
+    predict_words_service.loader.load_step('tokenizer')
+    predict_words_service.loader.load_step('nlp')
+    nlp = predict_words_service.nlp
+
+    tokenizer = predict_words_service.tokenizer
+    snapshot = predict_words_service.mongoClient.get_main_vocabulary_snapshot()
+    sources = [word for word in tokenizer.word_index if word != tokenizer.oov_token]
+    targets = list(dict.fromkeys(word for word in snapshot.words
+                                 if isinstance(word, str) and word and '\n' not in word))
+    metadata = {'spacy_model': predict_words_service.get_spacy_model_name(),
+                'exclude_tags': sorted(SYNONYM_EXCLUDE_TAGS),
+                'min_similarity': args.min_similarity,
+                'max_neighbours': args.max_neighbours}
+
+    def embed(words):
+        return VocabularyEmbedding(words, nlp.pipe(words, n_process=args.workers, batch_size=1000),
+                                   SYNONYM_EXCLUDE_TAGS)
+
+    previous_table = None
+    if not args.full and has_synonym_table(args.output_dir):
+        previous_table = SynonymTable(args.output_dir)
+
+        if any(previous_table.metadata.get(key) != value for key, value in metadata.items()):
+            print('Existing table was built with other settings, rebuilding it')
+            previous_table = None
+
+    started_at = time.perf_counter()
+
+    if previous_table is None:
+        source_embedding = embed(sources)
+        neighbours = find_all_neighbours(source_embedding, embed(targets), args.min_similarity, args.max_neighbours,
+                                         args.workers, args.chunk_size)
+        source_excluded = source_embedding.is_excluded
+        print(f'Built neighbours of {len(sources)} tokenizer words against {len(targets)} vocabulary words')
+    else:
+        neighbours, source_excluded, added_sources, added_targets = update_neighbours(
+            previous_table, sources, targets, embed, args.min_similarity, args.max_neighbours, args.workers,
+            args.chunk_size)
+        print(f'Updated table: {added_sources} tokenizer words and {added_targets} vocabulary words added, '
+              f'{len(set(previous_table.sources) - set(sources))} and '
+              f'{len(set(previous_table.targets) - set(targets))} removed')
+
+    save_synonym_table(args.output_dir, sources, targets, neighbours, source_excluded, metadata)
+
+    synonym_table = SynonymTable(args.output_dir)
+    stored = int(synonym_table.offsets[-1])
+    truncated = int((synonym_table.floors > np.float32(args.min_similarity)).sum())
+    print(f'Stored {stored} neighbours ({stored / max(1, len(sources)):.1f} per word, {truncated} words truncated at '
+          f'{args.max_neighbours}) in {time.perf_counter() - started_at:.1f}s to {args.output_dir}')
+
+    if args.check_samples:
+        print(check_table(predict_words_service, synonym_table, args.check_samples, args.min_similarity))
+
+
+if __name__ == '__main__':
+    main()
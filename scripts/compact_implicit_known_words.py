@@ -0,0 +1,71 @@
+import argparse
+import os
+import time
+
+from constants import LEVEL_ORDER
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Remove vocabulary entries that are already implied as known by the user level.')
+    parser.add_argument('--mongodb-uri', default=None,
+                        help='MongoDB connection string, defaults to the MONGODB_URI environment variable')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the entries that would be removed')
+
+    return parser.parse_args()
+
+
+def get_implicit_entry_condition(words):
+    return {'word': {'$in': words}, 'is_word_learnt': True,
+            'time_seen': {'$exists': False}, 'history_seen': {'$exists': False}}
+
+
+def count_implicit_entries(collection, level, words):
+    pipeline = [
+        {'$match': {'level': level}},
+        {'$project': {'count': {'$size': {'$filter': {
+            'input': {'$ifNull': ['$vocabulary', []]},
+            'as': 'entry',
+            'cond': {'$and': [
+                {'$in': ['$$entry.word', words]},
+                {'$eq': ['$$entry.is_word_learnt', True]},
+                {'$eq': [{'$type': '$$entry.time_seen'}, 'missing']},
+                {'$eq': [{'$type': '$$entry.history_seen'}, 'missing']}
+            ]}
+        }}}}},
+        {'$group': {'_id': None, 'users': {'$sum': 1}, 'entries': {'$sum': '$count'}}}
+    ]
+    result = list(collection.aggregate(pipeline))
+
+    return (result[0]['users'], result[0]['entries']) if result else (0, 0)
+
+
+def main():
+    args = parse_args()
+
+    if args.mongodb_uri:
+        os.environ['MONGODB_URI'] = args.mongodb_uri
+
+    from dbClient.MongoDbClient import MongoDbClient
+
+    mongo_client = MongoDbClient()
+    collection = mongo_client.users_vocabulary_collection
+    snapshot = mongo_client.get_main_vocabulary_snapshot()
+    started_at = time.perf_counter()
+
+    for level in LEVEL_ORDER[1:]:
+        words = snapshot.get_words_below_level(level)
+        users_count, entries_count = count_implicit_entries(collection, level, words)
+        print(f'{level}: {users_count} users, {entries_count} implied entries')
+
+        if args.dry_run or not entries_count:
+            continue
+
+        result = collection.update_many(
+            {'level': level, 'vocabulary': {'$elemMatch': get_implicit_entry_condition(words)}},
+            {'$pull': {'vocabulary': get_implicit_entry_condition(words)}, '$inc': {'vocabulary_version': 1}})
+        print(f'{level}: compacted {result.modified_count} users in {time.perf_counter() - started_at:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import os
+import pickle
+import random
+import sys
+
+from constants import MAX_SEQUENCE_LENGTH, TOKENIZER_PATH, COMPACT_TOKENIZER_PATH
+from models.compactTokenizer import convert_keras_tokenizer, load_compact_tokenizer, save_compact_tokenizer
+
+NOISE = ['Hello,', 'WORLD!', "don't", '(maybe)', 'e-mail', 'qwertyuiop', '\t', '\n', '...', '42', 'Ünïcode', 'ΑΣ']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Export the pickled Keras tokenizer to the compact tokenizer format. The export is only written '
+                    'when the compact tokenizer reproduces the Keras sequences on random texts.')
+    parser.add_argument('--tokenizer-path', default=TOKENIZER_PATH, help='Path to tokenizer.pickle')
+    parser.add_argument('--output-path', default=COMPACT_TOKENIZER_PATH, help='Path of the exported .npz file')
+    parser.add_argument('--check-samples', type=int, default=2000, help='Random texts compared against Keras')
+    parser.add_argument('--seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+def random_text(rng, words, length):
+    tokens = [rng.choice(NOISE) if rng.random() < 0.1 else rng.choice(words) for _ in range(length)]
+    tokens = [token.upper() if rng.random() < 0.05 else token for token in tokens]
+
+    return rng.choice([' ', '  ', '. ']).join(tokens)
+
+
+def random_texts(keras_tokenizer, samples, seed):
+    rng = random.Random(seed)
+    words = list(keras_tokenizer.word_index)
+
+    return [random_text(rng, words, rng.randint(0, 60)) for _ in range(samples)] + NOISE + ['']
+
+
+def check_parity(keras_tokenizer, tokenizer, texts):
+    maxlen = MAX_SEQUENCE_LENGTH - 1
+    mismatches = []
+
+    for text in texts:
+        expected = keras_tokenizer.texts_to_sequences([text])[0]
+
+        if tokenizer.texts_to_sequences([text])[0] != expected or tokenizer.tokenize_tail(text, maxlen) != \
+                expected[-maxlen:]:
+            mismatches.append(text)
+
+    reverse_mismatches = sum(tokenizer.index_word[index] != word
+                             for index, word in keras_tokenizer.index_word.items())
+
+    return mismatches, reverse_mismatches
+
+
+def main():
+    args = parse_args()
+
+    with open(args.tokenizer_path, 'rb') as handle:
+        keras_tokenizer = pickle.load(handle)
+
+    temporary_path = args.output_path + '.tmp'
+    save_compact_tokenizer(convert_keras_tokenizer(keras_tokenizer), temporary_path)
+    tokenizer = load_compact_tokenizer(temporary_path)
+    texts = random_texts(keras_tokenizer, args.check_samples, args.seed)
+    mismatches, reverse_mismatches = check_parity(keras_tokenizer, tokenizer, texts)
+
+    for text in mismatches[:5]:
+        print(f'mismatch: {text!r}')
+    print(f'parity: {len(texts)} texts, {len(mismatches)} mismatches, '
+          f'{reverse_mismatches} reverse table mismatches')
+
+    if tokenizer.word_index != keras_tokenizer.word_index or mismatches or reverse_mismatches:
+        os.remove(temporary_path)
+        print(f'FAILED: compact tokenizer output differs from {args.tokenizer_path}, '
+              f'nothing was written to {args.output_path}')
+        sys.exit(1)
+
+    os.replace(temporary_path, args.output_path)
+    print(f'Exported {len(tokenizer.word_index)} words ({os.path.getsize(args.output_path) / 1024:.1f} KiB, '
+          f'pickle {os.path.getsize(args.tokenizer_path) / 1024:.1f} KiB) to {args.output_path}')
+
+
+if __name__ == '__main__':
+    main()
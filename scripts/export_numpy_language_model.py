@@ -0,0 +1,98 @@
+import argparse
+import json
+import sys
+import tempfile
+
+import numpy as np
+
+from constants import MAX_SEQUENCE_LENGTH, NUMPY_MODEL_DIR, LANGUAGE_MODEL_PATH
+from models.sharedWeights import save_arrays
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Export the Keras next-word model to numpy weight arrays. The export is only written when the '
+                    'numpy backend reproduces the Keras predictions on random sequences within --tolerance.')
+    parser.add_argument('--model-path', default=LANGUAGE_MODEL_PATH, help='Path to next_word_model.h5')
+    parser.add_argument('--output-dir', default=NUMPY_MODEL_DIR,
+                        help='Directory for the exported .npy files and manifest')
+    parser.add_argument('--check-samples', type=int, default=512, help='Random sequences compared against Keras')
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help='Largest allowed absolute difference between numpy and Keras probabilities')
+
+    return parser.parse_args()
+
+
+def export_layers(model):
+    arrays = {}
+    layers = []
+
+    for layer in model.layers:
+        weight_names = []
+        for i, weights in enumerate(layer.get_weights()):
+            name = f'next_word_model/{layer.name}/{i}'
+            arrays[name] = np.asarray(weights, dtype=np.float32)
+            weight_names.append(name)
+
+        layers.append({
+            'name': layer.name,
+            'type': layer.__class__.__name__,
+            'config': json.loads(json.dumps(layer.get_config(), default=str)),
+            'weights': weight_names
+        })
+
+    return arrays, layers
+
+
+def random_sequences(count, vocabulary_size, seed=0):
+    rng = np.random.default_rng(seed)
+    sequences = rng.integers(1, vocabulary_size, (count, MAX_SEQUENCE_LENGTH - 1), dtype=np.int32)
+
+    for row, length in enumerate(rng.integers(1, MAX_SEQUENCE_LENGTH, count)):
+        sequences[row, :MAX_SEQUENCE_LENGTH - 1 - length] = 0
+
+    return sequences
+
+
+def check_parity(numpy_model, keras_model, sequences):
+    numpy_predictions = np.concatenate([numpy_model.predict_on_batch(batch) for batch in np.array_split(
+        sequences, max(1, len(sequences) // 64))])
+    keras_predictions = np.asarray(keras_model.predict(sequences, batch_size=64, verbose=0))
+
+    max_difference = float(np.abs(numpy_predictions - keras_predictions).max())
+    top1_agreement = float((numpy_predictions.argmax(axis=1) == keras_predictions.argmax(axis=1)).mean())
+
+    return max_difference, top1_agreement
+
+
+def main():
+    args = parse_args()
+
+    from tensorflow.keras.models import load_model
+    from models.numpyLanguageModel import NumpyLanguageModel
+
+    model = load_model(args.model_path)
+    arrays, layers = export_layers(model)
+    metadata = {'next_word_model': {'layers': layers, 'output_shape': list(model.output_shape)}}
+
+    with tempfile.TemporaryDirectory() as directory:
+        save_arrays(directory, arrays, metadata)
+        sequences = random_sequences(args.check_samples, model.output_shape[-1])
+        max_difference, top1_agreement = check_parity(NumpyLanguageModel(directory), model, sequences)
+
+    print(f'parity: {len(sequences)} sequences, max |numpy - keras| = {max_difference:.2e}, '
+          f'top-1 agreement = {top1_agreement:.4f}')
+
+    if max_difference > args.tolerance:
+        print(f'FAILED: difference exceeds tolerance {args.tolerance}, nothing was written to {args.output_dir}')
+        sys.exit(1)
+
+    save_arrays(args.output_dir, arrays, metadata)
+
+    size = sum(array.nbytes for array in arrays.values())
+    print(f"Exported {len(layers)} layers ({', '.join(layer['type'] for layer in layers)}), "
+          f'{size / 2 ** 20:.1f} MiB of weights to {args.output_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import argparse
+
+import numpy as np
+
+from constants import SHARED_WEIGHTS_DIR
+from models.sharedWeights import save_arrays
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export spaCy vectors to memory-mappable files.')
+    parser.add_argument('--output-dir', default=SHARED_WEIGHTS_DIR or './saved_models/shared',
+                        help='Directory for the exported .npy files and manifest')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    import en_core_web_lg
+
+    nlp = en_core_web_lg.load()
+    vectors = np.asarray(nlp.vocab.vectors.data)
+    save_arrays(args.output_dir, {'spacy_vectors': vectors},
+                {'spacy_model': f"{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}"})
+
+    print(f'Exported spacy_vectors {vectors.shape} {vectors.dtype} ({vectors.nbytes / 2 ** 20:.1f} MiB) '
+          f'to {args.output_dir}')
+
+
+if __name__ == '__main__':
+    main()
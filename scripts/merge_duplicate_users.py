@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+import time
+
+from pymongo.errors import OperationFailure
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Merge users_vocabulary documents that share a _user_id into one, then create the unique '
+                    '_user_id index and the other service indexes. Run it once before deploying the conditional '
+                    'write paths and repeat it until it reports no users changed during the merge.')
+    parser.add_argument('--mongodb-uri', default=None,
+                        help='MongoDB connection string, defaults to the MONGODB_URI environment variable')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the users with duplicate documents')
+
+    return parser.parse_args()
+
+
+def find_duplicate_users(collection):
+    pipeline = [
+        {'$group': {'_id': '$_user_id', 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+
+    return collection.aggregate(pipeline, allowDiskUse=True)
+
+
+def get_entry_rank(entry):
+    return entry.get('history_seen') or 0, entry.get('time_seen') or ''
+
+
+def merge_vocabularies(user_docs):
+    entries = {}
+
+    for user_doc in user_docs:
+        for entry in user_doc.get('vocabulary') or []:
+            current = entries.get(entry.get('word'))
+
+            if current is None or get_entry_rank(entry) > get_entry_rank(current):
+                entries[entry.get('word')] = entry
+
+    return list(entries.values())
+
+
+def merge_user_docs(user_docs):
+    user_docs = sorted(user_docs, key=lambda user_doc: user_doc.get('vocabulary_version', 0), reverse=True)
+    merged = dict(user_docs[0])
+    merged['level'] = next((user_doc['level'] for user_doc in user_docs if user_doc.get('level') is not None), None)
+    merged['vocabulary_version'] = user_docs[0].get('vocabulary_version', 0) + 1
+
+    if any('vocabulary' in user_doc for user_doc in user_docs):
+        merged['vocabulary'] = merge_vocabularies(user_docs)
+
+    return merged
+
+
+def merge_user(collection, ids):
+    user_docs = list(collection.find({'_id': {'$in': ids}}))
+
+    if len(user_docs) < 2:
+        return True
+
+    merged = merge_user_docs(user_docs)
+    result = collection.replace_one({'_id': merged['_id'], 'vocabulary_version': next(
+        user_doc.get('vocabulary_version') for user_doc in user_docs if user_doc['_id'] == merged['_id'])}, merged)
+
+    if result.matched_count == 0:
+        return False
+
+    is_current = True
+    for user_doc in user_docs:
+        if user_doc['_id'] != merged['_id']:
+            result = collection.delete_one({'_id': user_doc['_id'],
+                                            'vocabulary_version': user_doc.get('vocabulary_version')})
+            is_current = is_current and result.deleted_count > 0
+
+    return is_current
+
+
+def main():
+    args = parse_args()
+
+    if args.mongodb_uri:
+        os.environ['MONGODB_URI'] = args.mongodb_uri
+
+    from dbClient.dbClientFactory import create_db_client
+
+    mongo_client = create_db_client()
+    collection = mongo_client.users_vocabulary_collection
+    duplicates = list(find_duplicate_users(collection))
+    print(f'{len(duplicates)} users with {sum(duplicate["count"] for duplicate in duplicates)} documents')
+
+    if args.dry_run:
+        return
+
+    started_at = time.perf_counter()
+    stale_count = 0
+
+    for duplicate in duplicates:
+        stale_count += not merge_user(collection, duplicate['ids'])
+
+    print(f'merged {len(duplicates)} users in {time.perf_counter() - started_at:.1f}s, '
+          f'{stale_count} changed during the merge and will be merged again on the next run')
+
+    try:
+        mongo_client.create_indexes()
+    except OperationFailure as e:
+        print(f'could not create the indexes, run the merge again: {e}')
+        sys.exit(1)
+
+    print('created the indexes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import time
+
+from pymongo import ReplaceOne
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Copy embedded user vocabularies into the per-word collection. The copy runs online and can be '
+                    'repeated: users whose vocabulary changed since their last copy are copied again. Switch '
+                    'VOCABULARY_STORAGE to per_word after a pass that copies no users and do not copy again '
+                    'afterwards, since per-word writes also bump vocabulary_version. Finally run with '
+                    '--unset-embedded to drop the copied embedded arrays.')
+    parser.add_argument('--mongodb-uri', default=None,
+                        help='MongoDB connection string, defaults to the MONGODB_URI environment variable')
+    parser.add_argument('--batch-size', type=int, default=200, help='Users copied per progress report')
+    parser.add_argument('--unset-embedded', action='store_true',
+                        help='Only remove the embedded vocabulary array of every user that has been copied')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the users that would be copied')
+
+    return parser.parse_args()
+
+
+def get_pending_users_filter():
+    return {'vocabulary': {'$exists': True},
+            '$expr': {'$ne': [{'$ifNull': ['$vocabulary_version', 0]},
+                              {'$ifNull': ['$per_word_migrated_version', -1]}]}}
+
+
+def copy_user_vocabulary(mongo_client, user_doc):
+    user_id = user_doc['_user_id']
+    version = user_doc.get('vocabulary_version', 0)
+    entries = {entry['word']: entry for entry in user_doc.get('vocabulary') or [] if 'word' in entry}
+
+    if entries:
+        mongo_client.users_vocabulary_words_collection.bulk_write(
+            [ReplaceOne({'_user_id': user_id, 'word': word}, {**entry, '_user_id': user_id}, upsert=True)
+             for word, entry in entries.items()], ordered=False)
+
+    mongo_client.users_vocabulary_words_collection.delete_many({'_user_id': user_id,
+                                                                'word': {'$nin': list(entries)}})
+    result = mongo_client.users_vocabulary_collection.update_one(
+        {'_user_id': user_id, 'vocabulary_version': user_doc.get('vocabulary_version')},
+        {'$set': {'per_word_migrated_version': version}})
+
+    return len(entries), result.modified_count > 0
+
+
+def unset_embedded_vocabulary(mongo_client):
+    result = mongo_client.users_vocabulary_collection.update_many(
+        {'vocabulary': {'$exists': True}, 'per_word_migrated_version': {'$exists': True}},
+        {'$unset': {'vocabulary': ''}})
+
+    return result.modified_count
+
+
+def main():
+    args = parse_args()
+
+    if args.mongodb_uri:
+        os.environ['MONGODB_URI'] = args.mongodb_uri
+
+    from dbClient.PerWordMongoDbClient import PerWordMongoDbClient
+
+    mongo_client = PerWordMongoDbClient()
+    mongo_client.create_indexes()
+    collection = mongo_client.users_vocabulary_collection
+
+    if args.unset_embedded:
+        print(f'removed the embedded vocabulary of {unset_embedded_vocabulary(mongo_client)} users')
+        return
+
+    pending_count = collection.count_documents(get_pending_users_filter())
+    print(f'{pending_count} users to copy')
+
+    if args.dry_run:
+        return
+
+    started_at = time.perf_counter()
+    users_count = words_count = stale_count = 0
+    cursor = collection.find(get_pending_users_filter(), {'_user_id': 1, 'vocabulary': 1, 'vocabulary_version': 1},
+                             batch_size=args.batch_size)
+
+    for user_doc in cursor:
+        copied_words, is_current = copy_user_vocabulary(mongo_client, user_doc)
+        users_count += 1
+        words_count += copied_words
+        stale_count += not is_current
+
+        if users_count % args.batch_size == 0:
+            elapsed = time.perf_counter() - started_at
+            remaining = (pending_count - users_count) * elapsed / users_count
+            print(f'{users_count}/{pending_count} users, {words_count} words, '
+                  f'{users_count / elapsed:.0f} users/s, ~{max(remaining, 0):.0f}s left')
+
+    print(f'copied {users_count} users and {words_count} words in {time.perf_counter() - started_at:.1f}s, '
+          f'{stale_count} changed during the copy and will be copied again on the next run')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Precompute relearn queues for all users.')
+    parser.add_argument('--mongodb-uri', default=None,
+                        help='MongoDB connection string, defaults to the MONGODB_URI environment variable')
+    parser.add_argument('--batch-size', type=int, default=500, help='Users scored per model call')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.mongodb_uri:
+        os.environ['MONGODB_URI'] = args.mongodb_uri
+
+    from services.LearnWordsService import LearnWordsService
+
+    learn_words_service = LearnWordsService()
+    mongo_client = learn_words_service.mongoClient
+
+    users_count = 0
+    words_count = 0
+    started_at = time.perf_counter()
+
+    for users in mongo_client.iter_users_learning_vocabulary(args.batch_size):
+        queues = learn_words_service.score_relearn_queues(users)
+        mongo_client.save_relearn_queues(queues)
+
+        users_count += len(users)
+        words_count += sum(len(user_doc.get('vocabulary') or []) for user_doc in users)
+        elapsed = time.perf_counter() - started_at
+        print(f'{users_count} users, {words_count} words scored in {elapsed:.1f}s '
+              f'({users_count / elapsed:.1f} users/sec, {words_count / elapsed:.1f} words/sec)')
+
+    elapsed = time.perf_counter() - started_at
+    print(f'Done: {users_count} users, {words_count} words in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
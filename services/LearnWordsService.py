@@ -1,17 +1,56 @@
+import json
+import random
+import zlib
+from itertools import islice
+
 import numpy as np
 
-from constants import SECONDS_IN_DAY, MIN_DELTA_TIME, LEVEL_ORDER, HISTORY_CORRECT_THRESHOLD
-from dbClient.MongoDbClient import MongoDbClient
+from constants import (SECONDS_IN_DAY, MIN_DELTA_TIME, LEVEL_ORDER, HISTORY_CORRECT_THRESHOLD,
+                       WORDS_AMOUNT_TO_RELEARN, RELEARN_QUEUE_TTL, SEEN_WORDS_CACHE_SIZE,
+                       UNSEEN_WORD_SAMPLING_ATTEMPTS, RELEARN_SESSION_MAX_EVENTS, USER_VOCABULARY_MAX_PAGE_SIZE,
+                       USER_VOCABULARY_EXPORT_BATCH_SIZE, RELEARN_SESSION_MAX_CLOCK_SKEW_SECONDS)
+from dbClient.MongoDbClient import REPETITION_FIELDS
+from dbClient.dbClientFactory import get_db_client
 from models.logWordModel import LogWordModel
+from utils.ComponentLoader import ComponentLoader
+from utils.LruCache import LruCache
+from utils.Metrics import metrics
 
 from datetime import datetime, timedelta
 
 
 class LearnWordsService:
     def __init__(self):
-        self.mongoClient = MongoDbClient()
+        self.mongoClient = get_db_client()
+        self.logWordModel = None
+        self.seenWordsCache = LruCache(SEEN_WORDS_CACHE_SIZE)
+        self.loader = ComponentLoader([
+            ('log_model', self.load_log_model),
+            ('main_vocabulary', self.load_main_vocabulary)
+        ])
+        self.loader.load_step('log_model')
+
+    def load_log_model(self):
         self.logWordModel = LogWordModel()
 
+    def load_main_vocabulary(self):
+        self.mongoClient.get_main_vocabulary_snapshot()
+
+    def start_loading(self):
+        self.loader.load_in_background()
+
+    def ensure_loaded(self):
+        self.loader.load()
+
+    def retry_loading(self):
+        self.loader.load_in_background()
+
+    def is_ready(self):
+        return self.loader.is_ready()
+
+    def get_status(self):
+        return self.loader.get_status()
+
     def get_main_vocabulary(self):
         result = self.mongoClient.get_main_vocabulary()
 
@@ -22,63 +61,163 @@ class LearnWordsService:
 
         return result
 
+    def parse_vocabulary_query(self, params):
+        limit = params.get('limit')
+        learnt = params.get('learnt')
+
+        if isinstance(learnt, str):
+            learnt = {'true': True, 'false': False}.get(learnt.lower(), learnt)
+
+        if learnt not in (None, True, False):
+            raise ValueError('learnt must be true or false')
+
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise ValueError('limit must be an integer')
+
+            if not 0 < limit <= USER_VOCABULARY_MAX_PAGE_SIZE:
+                raise ValueError(f'limit must be between 1 and {USER_VOCABULARY_MAX_PAGE_SIZE}')
+
+        return {'limit': limit, 'cursor': params.get('cursor') or None,
+                'learnt': None if learnt is None else bool(learnt), 'prefix': params.get('prefix') or None}
+
+    def get_user_vocabulary_etag(self, user_id, query):
+        self.ensure_loaded()
+        level, vocabulary_version = self.mongoClient.get_user_vocabulary_state(user_id)
+        _, implicit_checksum = self.mongoClient.get_main_vocabulary_snapshot().get_sorted_words_below_level(level)
+        query_checksum = zlib.crc32(json.dumps([user_id, query], sort_keys=True).encode('utf-8'))
+
+        return level, f'{vocabulary_version}-{level}-{implicit_checksum:08x}-{query_checksum:08x}'
+
+    def get_user_vocabulary_page(self, user_id, level, query):
+        limit = query['limit']
+        entries = list(islice(self.mongoClient.iter_user_vocabulary_entries(
+            user_id, level, query['cursor'], query['learnt'], query['prefix'], limit + 1, limit + 1), limit + 1))
+        next_cursor = entries[limit - 1]['word'] if len(entries) > limit else None
+
+        return entries[:limit], next_cursor
+
+    def stream_user_vocabulary(self, user_id, level, query):
+        entries = self.mongoClient.iter_user_vocabulary_entries(
+            user_id, level, query['cursor'], query['learnt'], query['prefix'],
+            batch_size=USER_VOCABULARY_EXPORT_BATCH_SIZE)
+        separator = ''
+
+        yield '['
+        for batch in iter(lambda: list(islice(entries, USER_VOCABULARY_EXPORT_BATCH_SIZE)), []):
+            yield separator + ','.join(json.dumps(entry) for entry in batch)
+            separator = ','
+        yield ']'
+
     def get_user_learning_vocabulary(self, user_id):
-        result = self.mongoClient.get_user_learning_vocabulary(user_id)
+        with metrics.time_stage('learn', 'vocabulary_fetch'):
+            result = self.mongoClient.get_user_learning_vocabulary(user_id) or []
 
         filtered_result = [item for item in result if not item.get('is_word_learnt', False)]
 
         return filtered_result
 
-    def prepare_words_for_log_model(self, words_list):
-        current_time = datetime.now()
+    def prepare_words_for_log_model(self, words_list, current_time=None):
+        current_time = np.datetime64(current_time or datetime.now(), 's')
+        snapshot = self.mongoClient.get_main_vocabulary_snapshot()
+
+        words = np.array([obj.get('word') for obj in words_list], dtype=object)
+        rows = snapshot.get_rows(words)
+        found = rows >= 0
+
+        time_seen = np.array([obj.get('time_seen') or 'NaT' for obj in words_list], dtype='datetime64[s]')
+        history_seen = np.array([obj.get('history_seen', np.nan) for obj in words_list], dtype=np.float64)
+        history_correct = np.array([obj.get('history_correct', np.nan) for obj in words_list], dtype=np.float64)
+
+        features = np.full((len(words_list), 6), np.nan)
+        features[:, 0] = np.round((current_time - time_seen) / np.timedelta64(1, 's') / SECONDS_IN_DAY, 3)
+        features[:, 1] = history_correct
+        features[:, 2] = history_seen - history_correct
+        features[found, 3] = snapshot.age_of_acquisition[rows[found]]
+        features[found, 4] = snapshot.log_freq_hal[rows[found]]
+        features[found, 5] = snapshot.concreteness_rating[rows[found]]
 
-        result_array = []
+        mask = found & np.isfinite(features).all(axis=1)
+        mask[mask] = features[mask, 0] >= MIN_DELTA_TIME
 
-        for obj in words_list:
-            word = obj['word']
+        return words[mask], features[mask]
 
-            word_from_vocabulary = self.mongoClient.get_main_word(word)
+    def get_words_to_learn(self, words, features, amount=WORDS_AMOUNT_TO_RELEARN):
+        with metrics.time_stage('learn', 'scoring'):
+            predictions = self.logWordModel.predict_class(features)
 
-            aoa = word_from_vocabulary.get("Age_Of_Acquisition", None)
-            freq = word_from_vocabulary.get("Log_Freq_HAL", None)
-            con = word_from_vocabulary.get("Concreteness_Rating", None)
+        return self.select_words_to_relearn(words, predictions, amount)
 
-            time_seen = datetime.strptime(obj['time_seen'], "%Y-%m-%d %H:%M:%S")
-            delta_time = current_time - time_seen
+    def select_words_to_relearn(self, words, predictions, amount=WORDS_AMOUNT_TO_RELEARN):
+        probabilities = predictions[:, 0]
+        forgotten = np.flatnonzero(predictions[:, 1] == 0)
 
-            history_wrong = obj['history_seen'] - obj['history_correct']
+        if 0 < amount < len(forgotten):
+            forgotten = forgotten[np.argpartition(probabilities[forgotten], amount - 1)[:amount]]
 
-            x_delta_time = round(delta_time.total_seconds() / SECONDS_IN_DAY, 3)
-            x_history_correct = int(obj['history_correct'])
-            x_history_wrong = int(history_wrong)
-            x_aoa = float(aoa)
-            x_freq = float(freq)
-            x_con = float(con)
+        forgotten = forgotten[np.argsort(probabilities[forgotten], kind='stable')][:amount]
 
-            result_array.append({
-                "word": word,
-                "feature": [x_delta_time, x_history_correct, x_history_wrong, x_aoa, x_freq, x_con],
-                "is forgotten": True,
-                "probability": -1
+        return [{'word': words[i], 'probability': float(probabilities[i])} for i in forgotten]
 
+    def score_relearn_queues(self, users, amount=WORDS_AMOUNT_TO_RELEARN):
+        current_time = datetime.now()
+        computed_at = datetime.utcnow()
+
+        all_words = []
+        all_features = []
+        with metrics.time_stage('learn', 'feature_build'):
+            for user_doc in users:
+                words, features = self.prepare_words_for_log_model(user_doc.get('vocabulary') or [], current_time)
+                all_words.append(words)
+                all_features.append(features)
+
+        offsets = np.cumsum([len(words) for words in all_words], dtype=np.int64)[:-1]
+        features = np.concatenate(all_features) if all_features else np.empty((0, 6))
+
+        with metrics.time_stage('learn', 'scoring'):
+            predictions = self.logWordModel.predict_class(features) if len(features) else np.empty((0, 2))
+
+        queues = []
+        for user_doc, words, user_predictions in zip(users, all_words, np.split(predictions, offsets)):
+            queues.append({
+                '_user_id': user_doc['_user_id'],
+                'vocabulary_version': user_doc.get('vocabulary_version', 0),
+                'computed_at': computed_at,
+                'candidates_count': len(words),
+                'words': self.select_words_to_relearn(words, user_predictions, amount)
             })
 
-            result_array = [item for item in result_array if item["feature"][0] >= MIN_DELTA_TIME]
+        return queues
+
+    def is_relearn_queue_fresh(self, queue, vocabulary_version):
+        if not queue or queue.get('vocabulary_version') != vocabulary_version:
+            return False
 
-        return result_array
+        return datetime.utcnow() - queue['computed_at'] < timedelta(seconds=RELEARN_QUEUE_TTL)
 
-    def get_words_to_learn(self, words_array):
-        feature_array = np.array([item["feature"] for item in words_array])
+    def get_relearn_queue(self, user_id):
+        self.ensure_loaded()
+        vocabulary_version = self.mongoClient.get_user_vocabulary_version(user_id)
+        queue = self.mongoClient.get_relearn_queue(user_id)
 
-        my_predictions = self.logWordModel.predict_class(feature_array)
+        if self.is_relearn_queue_fresh(queue, vocabulary_version):
+            return queue
 
-        for i, prediction in enumerate(my_predictions):
-            words_array[i]["probability"] = prediction[0]
-            words_array[i]["is forgotten"] = not bool(prediction[1])
+        return self.rebuild_relearn_queue(user_id, vocabulary_version)
 
-        filtered_words_array = [item for item in words_array if item["is forgotten"]]
+    def rebuild_relearn_queue(self, user_id, vocabulary_version):
+        self.ensure_loaded()
+        user_doc = {
+            '_user_id': user_id,
+            'vocabulary_version': vocabulary_version,
+            'vocabulary': self.get_user_learning_vocabulary(user_id)
+        }
+        queue = self.score_relearn_queues([user_doc])[0]
+        self.mongoClient.save_relearn_queues([queue])
 
-        return filtered_words_array
+        return queue
 
     def check_if_word_exists_in_user_vocabulary(self, word, user_id):
         result = self.mongoClient.check_if_word_exists_in_user_vocabulary(word, user_id)
@@ -86,16 +225,14 @@ class LearnWordsService:
         return result
 
     def save_word_to_user_vocabulary(self, row, user_id):
-        word_exists = self.check_if_word_exists_in_user_vocabulary(row['word'], user_id)
+        self.ensure_loaded()
+        result = self.mongoClient.add_word_if_absent(row, user_id)
 
-        if not word_exists:
-            self.mongoClient.add_word_to_user_vocabulary(row, user_id)
-            return True
-        else:
-            return False
+        return result
 
     def get_word_definition(self, word):
-        word_doc = self.mongoClient.get_main_word(word)
+        with metrics.time_stage('learn', 'definition_fetch'):
+            word_doc = self.mongoClient.get_main_word(word)
 
         if word_doc and "Definitions" in word_doc:
             return word_doc["Definitions"]
@@ -110,24 +247,57 @@ class LearnWordsService:
         else:
             return None
 
-    def add_words_to_user_vocabulary(self, user_id, words):
-        words_to_add = [{"word": word["Word"], "is_word_learnt": True} for word in words]
-        self.mongoClient.add_words_array_to_user_vocabulary(user_id, words_to_add)
-
     def get_words_by_level(self, level):
         result = self.mongoClient.get_words_by_level(level)
 
         return result
 
     def set_user_level(self, user_id, level):
+        self.ensure_loaded()
+        if level not in LEVEL_ORDER:
+            raise ValueError(f"Unknown level '{level}'")
+
         self.mongoClient.set_user_level(user_id, level)
 
-        user_level_index = LEVEL_ORDER.index(level)
+    def get_seen_words(self, user_id):
+        cached = self.seenWordsCache.get(user_id)
+        state = self.mongoClient.get_user_sampling_state(user_id, cached[0] if cached else None)
+
+        if state is None:
+            return None, frozenset()
+
+        if 'words' in state:
+            cached = (state['vocabulary_version'], frozenset(state['words']))
+            self.seenWordsCache.put(user_id, cached)
+
+        return state.get('level'), cached[1]
 
-        for i in range(user_level_index):
-            current_level = LEVEL_ORDER[i]
-            words_for_current_level = self.get_words_by_level(current_level)
-            self.add_words_to_user_vocabulary(user_id, words_for_current_level)
+    def sample_unseen_word(self, user_id):
+        self.ensure_loaded()
+        level, seen_words = self.get_seen_words(user_id)
+        snapshot = self.mongoClient.get_main_vocabulary_snapshot()
+        rows = snapshot.levels.get(level) if level else None
+
+        if rows is None or not len(rows):
+            return None
+
+        for _ in range(UNSEEN_WORD_SAMPLING_ATTEMPTS):
+            row = rows[random.randrange(len(rows))]
+            if snapshot.words[row] not in seen_words:
+                return snapshot.docs[row]
+
+        unseen_rows = [row for row in rows if snapshot.words[row] not in seen_words]
+
+        return snapshot.docs[random.choice(unseen_rows)] if unseen_rows else None
+
+    def get_seen_words_cache_stats(self):
+        return self.seenWordsCache.get_stats()
+
+    def get_index_status(self):
+        return self.mongoClient.get_index_status()
+
+    def get_main_vocabulary_status(self):
+        return self.mongoClient.get_main_vocabulary_status()
 
     def get_user_level(self, user_id):
         result = self.mongoClient.get_user_level(user_id)
@@ -135,38 +305,128 @@ class LearnWordsService:
         return result
 
     def handle_repetition_result(self, user_id, word, repetition_result):
-        is_word_learnt = False
-        successful_result = False
+        self.ensure_loaded()
+        successful_result = self.mongoClient.update_repetition_result(user_id, word, repetition_result)
+
+        return successful_result
 
-        user_vocabulary = self.mongoClient.get_user_learning_vocabulary(user_id)
+    def group_session_events(self, events):
+        if not isinstance(events, list) or not events:
+            raise ValueError('Session must contain a non-empty list of events')
 
-        if user_vocabulary:
-            user_word = None
-            for entry in user_vocabulary:
-                if entry['word'] == word:
-                    user_word = entry
-                    break
+        if len(events) > RELEARN_SESSION_MAX_EVENTS:
+            raise ValueError(f'Session must not contain more than {RELEARN_SESSION_MAX_EVENTS} events')
 
-            if user_word:
-                history_correct = user_word.get('history_correct', 0)
-                time_seen = user_word.get('time_seen')
-                time_seen_datetime = datetime.strptime(time_seen, "%Y-%m-%d %H:%M:%S")
+        latest_timestamp = datetime.now() + timedelta(seconds=RELEARN_SESSION_MAX_CLOCK_SKEW_SECONDS)
+        events_by_word = {}
+        for index, event in enumerate(events):
+            try:
+                word = event['word']
+                repetition_result = event['result']
+                timestamp = datetime.fromisoformat(str(event['timestamp']))
+            except (TypeError, KeyError, ValueError):
+                raise ValueError(f'Event {index} must have a word, a result and an ISO timestamp')
 
-                if (repetition_result and (history_correct > (HISTORY_CORRECT_THRESHOLD - 1))
-                        and (datetime.now() - time_seen_datetime > timedelta(days=HISTORY_CORRECT_THRESHOLD))):
-                    is_word_learnt = True
+            if not isinstance(word, str) or not isinstance(repetition_result, bool):
+                raise ValueError(f'Event {index} must have a string word and a boolean result')
 
-                successful_result = self.mongoClient.update_user_vocabulary_word(user_id, word, repetition_result,
-                                                                                 is_word_learnt)
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone().replace(tzinfo=None)
 
-        return successful_result
+            if timestamp > latest_timestamp:
+                raise ValueError(f'Event {index} has a timestamp in the future')
+
+            timestamp = timestamp.replace(microsecond=0)
+            events_by_word.setdefault(word, []).append((timestamp, index, repetition_result))
+
+        for word_events in events_by_word.values():
+            word_events.sort()
+
+        return events_by_word
+
+    def fold_session_events(self, entry, word_events):
+        state = {field: entry.get(field) for field in REPETITION_FIELDS}
+        stored_time_seen = state['time_seen']
+        status = 'duplicate'
+        applied_events = 0
+
+        for timestamp, _, repetition_result in word_events:
+            time_seen = state['time_seen']
+
+            if stored_time_seen and timestamp.strftime("%Y-%m-%d %H:%M:%S") <= stored_time_seen:
+                continue
+
+            if state['is_word_learnt'] is not False:
+                status = 'applied' if applied_events else 'already_learnt'
+                continue
+
+            history_correct = state['history_correct'] or 0
+            time_seen_datetime = datetime.strptime(time_seen, "%Y-%m-%d %H:%M:%S") if time_seen else timestamp
+
+            state = {
+                'time_seen': timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                'history_seen': (state['history_seen'] or 0) + 1,
+                'history_correct': history_correct + int(repetition_result),
+                'is_word_learnt': (repetition_result and history_correct > (HISTORY_CORRECT_THRESHOLD - 1)
+                                   and timestamp - time_seen_datetime > timedelta(days=HISTORY_CORRECT_THRESHOLD))
+            }
+            status = 'applied'
+            applied_events += 1
+
+        return state, status, applied_events
+
+    def apply_relearn_session(self, user_id, events):
+        self.ensure_loaded()
+        events_by_word = self.group_session_events(events)
+        entries = {entry['word']: entry for entry in self.mongoClient.get_user_vocabulary_words(
+            user_id, list(events_by_word))}
+
+        outcomes = {}
+        states = []
+        for word, word_events in events_by_word.items():
+            entry = entries.get(word)
+
+            if entry is None:
+                outcomes[word] = {'word': word, 'status': 'not_found', 'applied_events': 0}
+                continue
+
+            state, status, applied_events = self.fold_session_events(entry, word_events)
+            outcomes[word] = dict(state, word=word, status=status, applied_events=applied_events)
+
+            if status == 'applied':
+                states.append((entry.get('time_seen'), dict(state, word=word)))
+
+        applied_words = self.mongoClient.apply_repetition_states(user_id, states)
+
+        for _, state in states:
+            if state['word'] not in applied_words:
+                outcomes[state['word']] = {'word': state['word'], 'status': 'conflict', 'applied_events': 0}
+
+        return list(outcomes.values())
 
     def increment_word_history_seen(self, user_id, word):
+        self.ensure_loaded()
         result = self.mongoClient.increment_word_history_seen(user_id, word)
 
+        if result == 0 and self.mongoClient.is_word_implicitly_known(user_id, word):
+            self.mongoClient.add_word_to_user_vocabulary({'word': word, 'is_word_learnt': True, 'history_seen': 1},
+                                                         user_id)
+            result = 1
+
         return result
 
     def update_word_status(self, user_id, word, new_status):
+        self.ensure_loaded()
         result = self.mongoClient.update_word_status(user_id, word, new_status)
 
-        return result
\ No newline at end of file
+        if result == 0 and self.mongoClient.is_word_implicitly_known(user_id, word):
+            self.mongoClient.add_word_to_user_vocabulary({'word': word, 'is_word_learnt': new_status}, user_id)
+            result = 1
+
+        return result
+
+    def toggle_word_status(self, user_id, word):
+        self.ensure_loaded()
+        result = self.mongoClient.toggle_word_status(user_id, word)
+
+        return result
@@ -1,24 +1,145 @@
 import os
+import sys
 import numpy as np
 import pickle
-import en_core_web_lg
 
-from constants import MAX_SEQUENCE_LENGTH
-from dbClient.MongoDbClient import MongoDbClient
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+from constants import (MAX_SEQUENCE_LENGTH, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, INFERENCE_TIMEOUT_SECONDS,
+                       SYNONYM_EXCLUDE_TAGS, SYNONYMS_AMOUNT, SHARED_WEIGHTS_DIR, INFERENCE_BACKEND, LANGUAGE_MODEL_PATH,
+                       NUMPY_MODEL_DIR, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TOP_K, TOKENIZER_PATH,
+                       COMPACT_TOKENIZER_PATH, SYNONYM_TABLE_DIR, USER_VOCABULARY_CACHE_SIZE)
+from dbClient.dbClientFactory import get_db_client
+from models.compactTokenizer import convert_keras_tokenizer, load_compact_tokenizer
+from models.inferenceBatcher import InferenceBatcher
+from models.numpyLanguageModel import NumpyLanguageModel
+from models.sharedWeights import load_arrays
+from models.synonymTable import SynonymTable, has_synonym_table
+from models.vocabularyEmbedding import VocabularyEmbedding
+from utils.ComponentLoader import ComponentLoader
+from utils.LruCache import LruCache
+from utils.Metrics import metrics
+
+
+def pad_sequence(sequence, maxlen):
+    padded = np.zeros((1, maxlen), dtype=np.int32)
+    sequence = sequence[-maxlen:]
+
+    if sequence:
+        padded[0, -len(sequence):] = sequence
+
+    return padded
+
+
+def prediction_cache_entry_size(entry):
+    _, top_words, top_scores = entry
+
+    return (sys.getsizeof(top_words) + sum(sys.getsizeof(word) for word in top_words) + top_scores.nbytes
+            + 8 * (MAX_SEQUENCE_LENGTH - 1) + sys.getsizeof(()) + 64)
 
  
 class PredictWordsService:
-    def __init__(self):
-        self.mongoClient = MongoDbClient()
-        self.langModel = load_model('/home/site/wwwroot/saved_models/next_word_model.h5')
+    def __init__(self, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.mongoClient = get_db_client()
+        self.tokenizer = None
+        self.langModel = None
+        self.nlp = None
+        self.index_word = None
+        self.valid_indices = None
+        self.synonymTable = None
+        self.learningWordsCache = LruCache(USER_VOCABULARY_CACHE_SIZE)
+        self.inferenceBatcher = InferenceBatcher(self.predict_batch, max_batch_size, max_wait_ms,
+                                                 INFERENCE_TIMEOUT_SECONDS)
+        self.predictionCache = LruCache(PREDICTION_CACHE_SIZE, sizeof=prediction_cache_entry_size)
+        self.loader = ComponentLoader([
+            ('tokenizer', self.load_tokenizer),
+            ('language_model', self.load_language_model),
+            ('nlp', self.load_nlp),
+            ('synonym_table', self.load_synonym_table),
+            ('warmup', self.warmup)
+        ])
+
+    def load_tokenizer(self):
+        if os.path.exists(COMPACT_TOKENIZER_PATH):
+            self.tokenizer = load_compact_tokenizer(COMPACT_TOKENIZER_PATH)
+        else:
+            with open(TOKENIZER_PATH, 'rb') as handle:
+                self.tokenizer = convert_keras_tokenizer(pickle.load(handle))
+        self.predictionCache.clear()
+
+    def load_language_model(self):
+        if INFERENCE_BACKEND == 'numpy':
+            self.langModel = NumpyLanguageModel(NUMPY_MODEL_DIR)
+        else:
+            from tensorflow.keras.models import load_model
+
+            self.langModel = load_model(LANGUAGE_MODEL_PATH)
+
+        self.index_word, self.valid_indices = self.build_index_word()
+        self.predictionCache.clear()
+
+    def load_nlp(self):
+        import en_core_web_lg
+
         self.nlp = en_core_web_lg.load()
-        with open('/home/site/wwwroot/tokenizer.pickle', 'rb') as handle:
-            self.tokenizer = pickle.load(handle)
+
+        if SHARED_WEIGHTS_DIR:
+            self.map_shared_vectors(SHARED_WEIGHTS_DIR)
+
+    def map_shared_vectors(self, directory):
+        arrays, metadata = load_arrays(directory, ['spacy_vectors'])
+        vectors = arrays['spacy_vectors']
+        spacy_model = self.get_spacy_model_name()
+
+        if metadata.get('spacy_model') != spacy_model or vectors.shape != self.nlp.vocab.vectors.data.shape:
+            raise ValueError(f"Shared vectors in {directory} were exported from {metadata.get('spacy_model')}, "
+                             f"not {spacy_model}")
+
+        self.nlp.vocab.vectors.data = vectors
+
+    def get_spacy_model_name(self):
+        return f"{self.nlp.meta['lang']}_{self.nlp.meta['name']}-{self.nlp.meta['version']}"
+
+    def load_synonym_table(self):
+        if not has_synonym_table(SYNONYM_TABLE_DIR):
+            self.synonymTable = None
+            return
+
+        synonym_table = SynonymTable(SYNONYM_TABLE_DIR)
+        spacy_model = self.get_spacy_model_name()
+
+        if synonym_table.metadata.get('spacy_model') != spacy_model or \
+                set(synonym_table.metadata.get('exclude_tags', ())) != SYNONYM_EXCLUDE_TAGS:
+            raise ValueError(f"Synonym table in {SYNONYM_TABLE_DIR} was built for "
+                             f"{synonym_table.metadata.get('spacy_model')} with other POS exclusions, "
+                             f"not {spacy_model}")
+
+        self.synonymTable = synonym_table
+
+    def preload_shared(self):
+        self.loader.load_step('tokenizer')
+        self.loader.load_step('nlp')
+
+    def warmup(self):
+        predictions = self.inferenceBatcher.predict(pad_sequence([], MAX_SEQUENCE_LENGTH - 1))
+        top_words, _ = self.decode_top_words(predictions)
+        self.embed_words(top_words or ['warmup']).find_similar(self.embed_words(['warmup']), 0.0, SYNONYMS_AMOUNT)
+
+    def start_loading(self):
+        self.loader.load_in_background()
+
+    def ensure_loaded(self):
+        self.loader.load()
+
+    def retry_loading(self):
+        self.loader.retry_in_background()
+
+    def is_ready(self):
+        return self.loader.is_ready()
+
+    def get_status(self):
+        return self.loader.get_status()
 
     def get_user_learning_vocabulary(self, user_id):
-        result = self.mongoClient.get_user_vocabulary(user_id)
+        result = self.mongoClient.get_user_learning_vocabulary(user_id) or []
 
         filtered_result = [item['word'] for item in result if not item.get('is_word_learnt', False)]
 
@@ -29,44 +150,146 @@ class PredictWordsService:
 
         return result
 
-    def predict_next_words(self, text, n=3):
-        sequence = self.tokenizer.texts_to_sequences([text])[0]
-        sequence = pad_sequences([sequence], maxlen=MAX_SEQUENCE_LENGTH - 1, padding='pre')
-        predictions = self.langModel.predict(sequence, verbose=0)[0]
+    def get_learning_vocabulary_embedding(self, user_id):
+        self.ensure_loaded()
+        version = self.mongoClient.get_user_vocabulary_version(user_id)
+        vocabulary_embedding = self.mongoClient.user_vocabulary_cache.get(user_id, version)
+
+        if vocabulary_embedding is None:
+            vocabulary_embedding = self.embed_words(self.get_user_learning_vocabulary(user_id))
+            self.mongoClient.user_vocabulary_cache.put(user_id, vocabulary_embedding, version)
+
+        return vocabulary_embedding
+
+    def get_learning_words(self, user_id):
+        version = self.mongoClient.get_user_vocabulary_version(user_id)
+        learning_words = self.learningWordsCache.get(user_id, version)
+
+        if learning_words is None:
+            learning_words = frozenset(self.get_user_learning_vocabulary(user_id))
+            self.learningWordsCache.put(user_id, learning_words, version)
+
+        return learning_words
 
-        top_indices = np.argsort(predictions)[-n:][::-1]
-        top_words = []
-        for i in top_indices:
-            for word, index in self.tokenizer.word_index.items():
-                if index == i:
-                    top_words.append(word)
-                    break
+    def get_vocabulary_cache_stats(self):
+        return self.mongoClient.user_vocabulary_cache.get_stats()
+
+    def build_index_word(self):
+        vocabulary_size = len(self.tokenizer.index_word)
+        output_size = self.langModel.output_shape[-1]
+
+        index_word = np.full(max(vocabulary_size, output_size), None, dtype=object)
+        index_word[:vocabulary_size] = self.tokenizer.index_word
+
+        valid_indices = np.not_equal(index_word, None)
+        valid_indices[0] = False
+
+        if self.tokenizer.oov_index is not None:
+            valid_indices[self.tokenizer.oov_index] = False
+
+        return index_word, valid_indices
+
+    def decode_top_words(self, predictions, n=3):
+        scores = np.where(self.valid_indices[:len(predictions)], predictions, -np.inf)
+        n = min(n, int(np.count_nonzero(self.valid_indices[:len(predictions)])))
+
+        if n < 1:
+            return [], np.empty(0, dtype=predictions.dtype)
+
+        top_indices = np.argpartition(scores, -n)[-n:]
+        top_indices = top_indices[np.argsort(scores[top_indices])[::-1]]
+
+        return self.index_word[top_indices].tolist(), predictions[top_indices]
+
+    def predict_batch(self, sequences):
+        with metrics.time_stage('predict', 'forward'):
+            return np.asarray(self.langModel.predict_on_batch(sequences))
+
+    def get_inference_stats(self):
+        return self.inferenceBatcher.get_stats()
+
+    def get_prediction_cache_stats(self):
+        return self.predictionCache.get_stats()
+
+    def predict_top_words(self, sequence, n):
+        key = tuple(sequence[0].tolist())
+        cached = self.predictionCache.get(key)
+
+        if cached is not None and cached[0] >= n:
+            return cached[1][:n], cached[2][:n]
+
+        top_k = max(n, PREDICTION_CACHE_TOP_K)
+        predictions = self.inferenceBatcher.predict(sequence)
+
+        with metrics.time_stage('predict', 'decode'):
+            top_words, top_scores = self.decode_top_words(predictions, top_k)
+        self.predictionCache.put(key, (top_k, top_words, top_scores))
+
+        return top_words[:n], top_scores[:n]
+
+    def predict_next_words(self, text, n=3, with_scores=False):
+        self.ensure_loaded()
+        with metrics.time_stage('predict', 'tokenize'):
+            sequence = self.tokenizer.tokenize_tail(text, MAX_SEQUENCE_LENGTH - 1)
+
+        with metrics.time_stage('predict', 'pad'):
+            sequence = pad_sequence(sequence, MAX_SEQUENCE_LENGTH - 1)
+
+        top_words, top_scores = self.predict_top_words(sequence, n)
+
+        if with_scores:
+            return list(zip(top_words, top_scores.tolist()))
 
         return top_words
 
+    def embed_words(self, words):
+        return VocabularyEmbedding(words, self.nlp.pipe(words), SYNONYM_EXCLUDE_TAGS)
+
     def find_synonyms(self, word, vocab, threshold=0.9):
-        word_doc = self.nlp(word)
-        exclude_tags = {'DT', 'PRP', 'IN', 'CC', 'WDT', 'NNP'}
-
-        if word_doc[0].tag_ in exclude_tags:
-            return []
-        synonyms = []
-        for v_word in vocab:
-            v_word_doc = self.nlp(v_word)
-            if v_word_doc[0].tag_ not in exclude_tags:
-                similarity = word_doc.similarity(v_word_doc)
-                if similarity > threshold:
-                    synonyms.append((v_word, similarity))
-        synonyms = sorted(synonyms, key=lambda x: x[1], reverse=True)[:3]
+        self.ensure_loaded()
+        vocabulary_embedding = vocab if isinstance(vocab, VocabularyEmbedding) else self.embed_words(vocab)
+        synonyms = vocabulary_embedding.find_similar(self.embed_words([word]), threshold, SYNONYMS_AMOUNT)[0]
+
         return [synonym[0] for synonym in synonyms]
 
     def predict_next_words_with_synonyms(self, user_id, text, n=3, threshold=0.55):
-        vocabulary = self.get_user_learning_vocabulary(user_id)
         top_words = self.predict_next_words(text, n)
+
+        if self.synonymTable is not None:
+            synonyms_in_vocab = self.find_synonyms_in_table(self.get_learning_words(user_id), top_words, threshold)
+
+            if synonyms_in_vocab is not None:
+                return synonyms_in_vocab
+
+        vocabulary_embedding = self.get_learning_vocabulary_embedding(user_id)
+
+        return self.find_synonyms_in_vocabulary(vocabulary_embedding, top_words, threshold)
+
+    def find_synonyms_in_table(self, learning_words, top_words, threshold=0.55):
+        with metrics.time_stage('predict', 'synonym_lookup'):
+            all_synonyms = self.synonymTable.find_similar(top_words, learning_words, threshold, SYNONYMS_AMOUNT)
+
+        metrics.increment('synonym_table_lookups_total', (('result', 'fallback' if all_synonyms is None else 'hit'),))
+
+        if all_synonyms is None:
+            return None
+
+        return self.collect_synonyms(top_words, all_synonyms)
+
+    def find_synonyms_in_vocabulary(self, vocabulary_embedding, top_words, threshold=0.55):
+        with metrics.time_stage('predict', 'embed'):
+            top_words_embedding = self.embed_words(top_words)
+
+        with metrics.time_stage('predict', 'synonym_search'):
+            all_synonyms = vocabulary_embedding.find_similar(top_words_embedding, threshold, SYNONYMS_AMOUNT)
+
+        return self.collect_synonyms(top_words, all_synonyms)
+
+    def collect_synonyms(self, top_words, all_synonyms):
         synonyms_in_vocab = {}
 
-        for word in top_words:
-            synonyms = self.find_synonyms(word, vocabulary, threshold)
+        for word, synonyms in zip(top_words, all_synonyms):
+            synonyms = [synonym[0] for synonym in synonyms]
             synonyms_in_vocab[word] = [] if not synonyms or word == 'statement' or word == 'however' else synonyms
 
         return synonyms_in_vocab
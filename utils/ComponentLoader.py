@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class ComponentLoader:
+    def __init__(self, steps):
+        self.steps = steps
+        self.components = {name: {'loaded': False, 'seconds': None, 'error': None} for name, _ in steps}
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def load_step(self, name):
+        component = self.components[name]
+        if component['loaded']:
+            return
+
+        started_at = time.perf_counter()
+        try:
+            dict(self.steps)[name]()
+        except Exception as e:
+            component['error'] = str(e)
+            raise
+
+        component.update(loaded=True, seconds=round(time.perf_counter() - started_at, 3), error=None)
+
+    def load(self):
+        if self.ready.is_set():
+            return
+
+        with self.lock:
+            if self.ready.is_set():
+                return
+
+            for name, _ in self.steps:
+                self.load_step(name)
+
+            self.ready.set()
+
+    def load_quietly(self):
+        try:
+            self.load()
+        except Exception:
+            pass
+
+    def load_in_background(self):
+        if self.ready.is_set():
+            return
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.load_quietly, name='component-loader', daemon=True)
+            self.thread.start()
+
+    def retry_in_background(self):
+        if self.thread is not None:
+            self.load_in_background()
+
+    def is_ready(self):
+        return self.ready.is_set()
+
+    def get_status(self):
+        return {name: dict(component) for name, component in self.components.items()}
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+
+class LruCache:
+    def __init__(self, max_entries, max_bytes=None, sizeof=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, version=None):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None or (version is not None and entry[0] != version):
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[1]
+
+    def put(self, key, value, version=None):
+        size = self.sizeof(value)
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[2]
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self.entries[key] = (version, value, size)
+            self.total_bytes += size
+
+            while len(self.entries) > self.max_entries or (
+                    self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted[2]
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+
+            if entry is not None:
+                self.total_bytes -= entry[2]
+                self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
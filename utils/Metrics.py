@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from constants import METRICS_DIR, METRICS_FLUSH_SECONDS, METRICS_BUCKETS
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = [f'{key}="{escape_label(value)}"' for key, value in tuple(labels) + tuple(extra)]
+
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Timer:
+    __slots__ = ('metrics', 'key', 'started_at')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe_key(self.key, time.perf_counter() - self.started_at)
+
+
+class Metrics:
+    def __init__(self, namespace, buckets, directory=None, flush_interval=5.0):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.descriptions = {}
+        self.reset()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.thread_stores = []
+        self.flush_thread = None
+
+    def describe(self, name, kind, description):
+        self.descriptions[name] = (kind, description)
+
+    def get_store(self):
+        store = getattr(self.local, 'store', None)
+
+        if store is None:
+            store = {'histograms': {}, 'counters': {}}
+            self.local.store = store
+
+            with self.lock:
+                self.thread_stores.append(store)
+
+                if self.directory and self.flush_thread is None:
+                    self.flush_thread = threading.Thread(target=self.flush_periodically, name='metrics-flush',
+                                                         daemon=True)
+                    self.flush_thread.start()
+
+        return store
+
+    def observe_key(self, key, seconds):
+        histograms = self.get_store()['histograms']
+        histogram = histograms.get(key)
+
+        if histogram is None:
+            histogram = histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+
+        histogram[0][bisect_left(self.buckets, seconds)] += 1
+        histogram[1] += seconds
+
+    def observe(self, name, labels, seconds):
+        self.observe_key((name, tuple(labels)), seconds)
+
+    def increment(self, name, labels, amount=1):
+        counters = self.get_store()['counters']
+        key = (name, tuple(labels))
+        counters[key] = counters.get(key, 0) + amount
+
+    def timer(self, name, labels):
+        return Timer(self, (name, tuple(labels)))
+
+    def time_stage(self, service, stage):
+        return Timer(self, ('stage_duration_seconds', (('service', service), ('stage', stage))))
+
+    def collect_local(self):
+        histograms = {}
+        counters = {}
+
+        with self.lock:
+            stores = list(self.thread_stores)
+
+        for store in stores:
+            for key, (bucket_counts, total) in list(store['histograms'].items()):
+                merged = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], bucket_counts)]
+                merged[1] += total
+
+            for key, value in list(store['counters'].items()):
+                counters[key] = counters.get(key, 0) + value
+
+        return histograms, counters
+
+    def get_path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def flush(self):
+        histograms, counters = self.collect_local()
+        path = self.get_path(os.getpid())
+        temporary_path = f'{path}.tmp'
+
+        with open(temporary_path, 'w') as handle:
+            json.dump({
+                'histograms': [[name, labels, bucket_counts, total]
+                               for (name, labels), (bucket_counts, total) in histograms.items()],
+                'counters': [[name, labels, value] for (name, labels), value in counters.items()]
+            }, handle)
+
+        os.replace(temporary_path, path)
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def collect(self):
+        if not self.directory:
+            return self.collect_local()
+
+        self.flush()
+        histograms = {}
+        counters = {}
+
+        for file_name in os.listdir(self.directory):
+            if not (file_name.startswith('metrics-') and file_name.endswith('.json')):
+                continue
+
+            try:
+                with open(os.path.join(self.directory, file_name)) as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                continue
+
+            for name, labels, bucket_counts, total in data['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                merged = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], bucket_counts)]
+                merged[1] += total
+
+            for name, labels, value in data['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+
+        return histograms, counters
+
+    def render(self):
+        histograms, counters = self.collect()
+        lines = []
+
+        for name in sorted({key[0] for key in histograms} | {key[0] for key in counters}):
+            full_name = f'{self.namespace}_{name}'
+            kind, description = self.descriptions.get(name, ('histogram' if any(
+                key[0] == name for key in histograms) else 'counter', name))
+            lines.append(f'# HELP {full_name} {description}')
+            lines.append(f'# TYPE {full_name} {kind}')
+
+            for (metric_name, labels), (bucket_counts, total) in sorted(histograms.items()):
+                if metric_name != name:
+                    continue
+
+                cumulative = 0
+                for upper_bound, count in zip(self.buckets + (float('inf'),), bucket_counts):
+                    cumulative += count
+                    le = '+Inf' if upper_bound == float('inf') else repr(upper_bound)
+                    lines.append(f'{full_name}_bucket{format_labels(labels, [("le", le)])} {cumulative}')
+
+                lines.append(f'{full_name}_sum{format_labels(labels)} {total}')
+                lines.append(f'{full_name}_count{format_labels(labels)} {cumulative}')
+
+            for (metric_name, labels), value in sorted(counters.items()):
+                if metric_name == name:
+                    lines.append(f'{full_name}{format_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics('word_app', METRICS_BUCKETS, METRICS_DIR, METRICS_FLUSH_SECONDS)
+metrics.describe('request_duration_seconds', 'histogram', 'Request latency by route.')
+metrics.describe('requests_total', 'counter', 'Requests by route and status.')
+metrics.describe('request_errors_total', 'counter', 'Requests that failed with a 5xx status.')
+metrics.describe('stage_duration_seconds', 'histogram', 'Latency of the model and vocabulary stages.')
+metrics.describe('synonym_table_lookups_total', 'counter', 'Synonym lookups answered by the table or sent to spaCy.')
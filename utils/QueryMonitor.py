@@ -0,0 +1,129 @@
+import threading
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+current_request = ContextVar('current_request', default=None)
+
+IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'endSessions', 'saslStart', 'saslContinue',
+                    'buildInfo', 'killCursors'}
+SHAPE_FIELDS = ('filter', 'q', 'query', 'pipeline', 'updates', 'deletes')
+
+
+def get_shape(value):
+    if isinstance(value, dict):
+        return {key: get_shape(item) for key, item in value.items()}
+
+    if isinstance(value, list):
+        return [get_shape(item) for item in value]
+
+    return '?'
+
+
+def get_query_shape(command_name, command):
+    if command_name == 'getMore':
+        return None
+
+    collection = command.get(command_name)
+    body = {field: get_shape(command[field]) for field in SHAPE_FIELDS if field in command}
+
+    return f'{command_name} {collection} {body}'
+
+
+class RequestQueries:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+
+
+class QueryMonitor(monitoring.CommandListener):
+    def __init__(self, max_queries, max_repeated_queries, max_flagged_requests):
+        self.max_queries = max_queries
+        self.max_repeated_queries = max_repeated_queries
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.commands = {}
+        self.endpoints = {}
+        self.flagged_requests = deque(maxlen=max_flagged_requests)
+
+    def begin_request(self, endpoint):
+        current_request.set(RequestQueries(endpoint))
+
+    def end_request(self):
+        request_queries = current_request.get()
+        current_request.set(None)
+
+        if request_queries is None:
+            return
+
+        repeated_shapes = {shape: count for shape, count in request_queries.shapes.items()
+                           if count >= self.max_repeated_queries}
+        is_flagged = request_queries.count > self.max_queries or bool(repeated_shapes)
+
+        with self.lock:
+            totals = self.endpoints.setdefault(request_queries.endpoint, {
+                'requests': 0, 'commands': 0, 'total_ms': 0.0, 'max_commands': 0, 'flagged_requests': 0})
+            totals['requests'] += 1
+            totals['commands'] += request_queries.count
+            totals['total_ms'] += request_queries.total_ms
+            totals['max_commands'] = max(totals['max_commands'], request_queries.count)
+
+            if is_flagged:
+                totals['flagged_requests'] += 1
+                self.flagged_requests.append({'endpoint': request_queries.endpoint,
+                                              'commands': request_queries.count,
+                                              'total_ms': round(request_queries.total_ms, 3),
+                                              'repeated_queries': repeated_shapes})
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+
+        request_queries = current_request.get()
+        shape = get_query_shape(event.command_name, event.command) if request_queries is not None else None
+
+        with self.lock:
+            self.pending[(event.connection_id, event.request_id)] = (request_queries, shape)
+
+    def succeeded(self, event):
+        self.record(event)
+
+    def failed(self, event):
+        self.record(event)
+
+    def record(self, event):
+        with self.lock:
+            pending = self.pending.pop((event.connection_id, event.request_id), None)
+
+            if pending is None:
+                return
+
+            duration_ms = event.duration_micros / 1000
+            totals = self.commands.setdefault(event.command_name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            totals['count'] += 1
+            totals['total_ms'] += duration_ms
+            totals['max_ms'] = max(totals['max_ms'], duration_ms)
+
+            request_queries, shape = pending
+
+            if request_queries is not None:
+                request_queries.count += 1
+                request_queries.total_ms += duration_ms
+
+                if shape is not None:
+                    request_queries.shapes[shape] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'max_queries': self.max_queries,
+                'max_repeated_queries': self.max_repeated_queries,
+                'commands': {name: dict(totals, mean_ms=totals['total_ms'] / totals['count'])
+                             for name, totals in self.commands.items()},
+                'endpoints': {endpoint: dict(totals, mean_commands=totals['commands'] / totals['requests'])
+                              for endpoint, totals in self.endpoints.items()},
+                'flagged_requests': list(self.flagged_requests)
+            }
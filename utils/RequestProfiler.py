@@ -0,0 +1,158 @@
+import cProfile
+import hmac
+import itertools
+import json
+import os
+import pstats
+import time
+from datetime import datetime
+
+from utils.QueryMonitor import current_request
+
+CATEGORIES = (
+    ('/services/', 'services'),
+    ('/dbClient/', 'db_client'),
+    ('/models/', 'models'),
+    ('pymongo', 'pymongo'),
+    ('bson', 'pymongo'),
+    ('numpy', 'numpy'),
+    ('tensorflow', 'tensorflow'),
+    ('keras', 'tensorflow'),
+    ('spacy', 'spacy'),
+    ('thinc', 'spacy'),
+    ('flask', 'flask'),
+    ('werkzeug', 'flask')
+)
+TOP_FUNCTIONS = 30
+NOT_CAPTURED = ('Model forward passes run on the InferenceBatcher worker thread and are not in this profile, the '
+                'request only shows the wait for its result. See stage_duration_seconds{stage="forward"} in '
+                '/metrics.')
+
+
+def get_category(file_name):
+    for marker, category in CATEGORIES:
+        if marker in file_name:
+            return category
+
+    return 'other'
+
+
+def summarize_stats(profile):
+    stats = pstats.Stats(profile)
+    breakdown = {}
+    functions = []
+
+    for (file_name, line, function_name), (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+        category = get_category(file_name)
+        breakdown[category] = breakdown.get(category, 0.0) + total_time * 1000
+        functions.append({'function': f'{file_name}:{line}({function_name})', 'calls': calls,
+                          'tottime_ms': round(total_time * 1000, 3), 'cumtime_ms': round(cumulative_time * 1000, 3)})
+
+    functions.sort(key=lambda function: function['cumtime_ms'], reverse=True)
+
+    return {category: round(ms, 3) for category, ms in breakdown.items()}, functions[:TOP_FUNCTIONS]
+
+
+class RequestProfiler:
+    def __init__(self, directory, max_profiles, token=None, routes=()):
+        if max_profiles < 1:
+            raise ValueError(f'At least one profile must be kept, got {max_profiles}')
+
+        if routes and not token:
+            raise ValueError('Profiling routes requires a profiling token, otherwise the profiles cannot be read')
+
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.token = token
+        self.routes = frozenset(routes)
+        self.enabled = bool(token or self.routes)
+        self.sequence = itertools.count()
+
+    def is_admin(self, token):
+        return bool(self.token and token) and hmac.compare_digest(self.token, token)
+
+    def should_profile(self, route, token):
+        if not self.enabled or route.startswith('/admin/'):
+            return False
+
+        return route in self.routes or self.is_admin(token)
+
+    def start(self):
+        profile = cProfile.Profile()
+        profile.enable()
+
+        return profile, time.perf_counter()
+
+    def stop(self, started, route, method, status):
+        profile, started_at = started
+        profile.disable()
+        duration_ms = (time.perf_counter() - started_at) * 1000
+        request_queries = current_request.get()
+        breakdown, functions = summarize_stats(profile)
+        profile_id = f'{datetime.utcnow():%Y%m%dT%H%M%S}-{os.getpid()}-{next(self.sequence):06d}'
+
+        summary = {
+            'id': profile_id,
+            'route': route,
+            'method': method,
+            'status': status,
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'duration_ms': round(duration_ms, 3),
+            'db': {
+                'commands': request_queries.count if request_queries else None,
+                'total_ms': round(request_queries.total_ms, 3) if request_queries else None,
+                'queries': dict(request_queries.shapes) if request_queries else {}
+            },
+            'breakdown_ms': breakdown,
+            'not_captured': NOT_CAPTURED,
+            'top_functions': functions
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(os.path.join(self.directory, f'{profile_id}.prof'))
+
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w') as handle:
+            json.dump(summary, handle)
+
+        self.trim()
+
+        return profile_id
+
+    def list_profile_ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        return sorted(file_name[:-len('.json')] for file_name in os.listdir(self.directory)
+                      if file_name.endswith('.json'))
+
+    def trim(self):
+        profile_ids = self.list_profile_ids()
+
+        for profile_id in profile_ids[:max(0, len(profile_ids) - self.max_profiles)]:
+            for extension in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + extension))
+                except OSError:
+                    pass
+
+    def get_summaries(self):
+        summaries = []
+
+        for profile_id in reversed(self.list_profile_ids()):
+            try:
+                with open(os.path.join(self.directory, f'{profile_id}.json')) as handle:
+                    summary = json.load(handle)
+            except (OSError, ValueError):
+                continue
+
+            summaries.append(dict({key: summary[key] for key in ('id', 'route', 'method', 'status', 'created_at',
+                                                                 'duration_ms', 'db', 'breakdown_ms')},
+                                  not_captured=summary.get('not_captured', NOT_CAPTURED)))
+
+        return summaries
+
+    def get_path(self, profile_id, extension):
+        if profile_id not in self.list_profile_ids():
+            return None
+
+        return os.path.join(self.directory, profile_id + extension)